@@ -0,0 +1,28 @@
+import hashlib
+from collections import Counter
+
+from django.core.cache import cache
+
+# Счетчики попаданий и промахов кэша ответов в текущем процессе.
+cache_stats = Counter()
+
+
+def response_cache_key(prefix, request, versions):
+    """Ключ кэша, не зависящий от порядка и повторов параметров запроса.
+
+    В ключ входят версии моделей, поэтому их изменение делает
+    старые записи недостижимыми, и они вытесняются по таймауту.
+    """
+    params = []
+    for name in sorted(request.query_params):
+        values = sorted(set(filter(None, request.query_params.getlist(name))))
+        if values and (name, values) != ('page', ['1']):
+            params.append((name, values))
+    raw = repr((versions, request.accepted_media_type, params))
+    return f'{prefix}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def get_cached_response_data(prefix, key):
+    data = cache.get(key)
+    cache_stats[(prefix, 'miss' if data is None else 'hit')] += 1
+    return data
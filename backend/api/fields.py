@@ -0,0 +1,126 @@
+import binascii
+import re
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile,
+    TemporaryUploadedFile,
+    UploadedFile,
+)
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_MARKER = ';base64,'
+# Кратно 4, чтобы каждый кусок base64 декодировался независимо.
+BASE64_CHUNK_SIZE = 64 * 1024
+WHITESPACE_RE = re.compile(r'\s')
+
+
+class StreamingImageField(serializers.ImageField):
+    """Изображение в base64 (data URL) или файлом из multipart-запроса.
+
+    Base64 декодируется кусками в файл: небольшие остаются в памяти,
+    крупные уходят во временный файл на диске, как обычные загрузки
+    Django. Размер проверяется до декодирования, размеры изображения -
+    по заголовку, без распаковки пикселей.
+    """
+
+    # MPO - JPEG с дополнительными кадрами, так снимают многие
+    # телефоны; браузеры показывают его как обычный JPEG.
+    FORMATS = {'JPEG': 'jpg', 'MPO': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+    CONTENT_TYPES = {
+        'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif',
+    }
+    default_error_messages = {
+        'invalid_type': 'Ожидается изображение в base64 или файл.',
+        'invalid_base64': 'Некорректные данные base64.',
+        'invalid_image': (
+            'Загрузите корректное изображение в формате JPEG, PNG или GIF.'
+        ),
+        'max_size': 'Размер изображения не должен превышать {max_size} МБ.',
+        'max_pixels': (
+            'Изображение слишком большое: не более {max_pixels} '
+            'млн пикселей.'
+        ),
+    }
+
+    def __init__(self, max_size=None, max_pixels=None, **kwargs):
+        self.max_size = max_size or settings.RECIPE_IMAGE_MAX_SIZE
+        self.max_pixels = max_pixels or settings.RECIPE_IMAGE_MAX_PIXELS
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = self.decode(data)
+        elif not isinstance(data, UploadedFile):
+            self.fail('invalid_type')
+        elif data.size > self.max_size:
+            self.fail_max_size()
+        # Проверки имени и пустого файла; сам файл Pillow не открывает.
+        file = serializers.FileField.to_internal_value(self, data)
+        self.check_image(file)
+        return file
+
+    def fail_max_size(self):
+        self.fail('max_size', max_size=self.max_size // (1024 * 1024))
+
+    def decode(self, data):
+        start = data.find(BASE64_MARKER)
+        start = 0 if start == -1 else start + len(BASE64_MARKER)
+        if WHITESPACE_RE.search(data, start):
+            # base64 с переносами строк (по 76 символов): куски для
+            # декодирования должны содержать только значащие символы.
+            data = ''.join(data[start:].split())
+            start = 0
+        length = len(data) - start
+        padding = data.endswith('=') + data.endswith('==')
+        size = length * 3 // 4 - padding
+        if length % 4 or size <= 0:
+            self.fail('invalid_base64')
+        if size > self.max_size:
+            self.fail_max_size()
+        name = str(uuid.uuid4())
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            file = TemporaryUploadedFile(name, None, size, None)
+        else:
+            file = InMemoryUploadedFile(
+                BytesIO(), None, name, None, size, None
+            )
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+                file.write(binascii.a2b_base64(
+                    data[offset:offset + BASE64_CHUNK_SIZE]
+                ))
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+        file.seek(0)
+        return file
+
+    def check_image(self, file):
+        try:
+            # open() читает только заголовок: формат и размеры.
+            image = Image.open(file)
+            image_format = image.format
+            pixels = image.width * image.height
+        except Image.DecompressionBombError:
+            self.fail_max_pixels()
+        except Exception:
+            self.fail('invalid_image')
+        if image_format not in self.FORMATS:
+            self.fail('invalid_image')
+        if pixels > self.max_pixels:
+            self.fail_max_pixels()
+        try:
+            image.verify()
+        except Exception:
+            self.fail('invalid_image')
+        file.seek(0)
+        extension = self.FORMATS[image_format]
+        file.name = f'{uuid.uuid4()}.{extension}'
+        file.content_type = self.CONTENT_TYPES[extension]
+
+    def fail_max_pixels(self):
+        self.fail('max_pixels', max_pixels=self.max_pixels // 1000000)
@@ -1,10 +1,18 @@
 from django_filters import rest_framework as filters
 
+from recipes.autocomplete import autocomplete
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.scores import SCORE_ORDERINGS
+from recipes.search import search_recipes
+from .versions import get_versions
 
 
 class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(lookup_expr='startswith')
+    name = filters.CharFilter(method='filter_name')
+
+    def filter_name(self, queryset, name, value):
+        (version,), _ = get_versions((Ingredient,))
+        return autocomplete(queryset, value, version=version)
 
     class Meta:
         model = Ingredient
@@ -23,21 +31,34 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(
+            ('popular', 'Популярные'),
+            ('trending', 'Популярные за последнее время'),
+        ),
+        method='filter_ordering',
+    )
 
     def filter_is_favorited(self, queryset, name, value):
         if value:
-            return queryset.filter(
-                favorites__user=self.request.user
-            )
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value:
-            return queryset.filter(
-                shopping_cart__user=self.request.user
-            )
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by_score(SCORE_ORDERINGS[value])
+
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart', 'search',
+            'ordering',
+        )
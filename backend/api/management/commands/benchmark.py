@@ -0,0 +1,213 @@
+import base64
+import json
+import random
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+)
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def image_data():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), (200, 80, 40)).save(buffer, 'JPEG')
+    return 'data:image/jpeg;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа и число SQL-запросов основных эндпоинтов '
+        'API на текущих данных (см. seed_benchmark). Запросы выполняются '
+        'тестовым клиентом Django в этом же процессе; созданные рецепты '
+        'откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Число замеров на эндпоинт.',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Число запросов прогрева, не входящих в замеры.',
+        )
+        parser.add_argument(
+            '--only', nargs='+', metavar='NAME',
+            help='Замерить только эти эндпоинты.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Вывести результаты в JSON.',
+        )
+
+    def handle(self, *args, **options):
+        # Разрешает хост testserver тестового клиента.
+        setup_test_environment()
+        self.rng = random.Random(options['seed'])
+        user = User.objects.annotate(
+            subscriptions=Count('follower')
+        ).order_by('-subscriptions', 'pk').first()
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        if user is None or not recipe_ids:
+            raise CommandError(
+                'Нет данных для замеров: выполните seed_benchmark.'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        self.anonymous = Client()
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.recipe_ids = recipe_ids
+        self.tags = list(Tag.objects.values_list('slug', 'pk'))
+        self.ingredients = list(Ingredient.objects.values_list('pk', 'name'))
+        endpoints = self.endpoints()
+        if options['only']:
+            unknown = set(options['only']) - set(endpoints)
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные эндпоинты: {", ".join(sorted(unknown))}'
+                )
+            endpoints = {
+                name: endpoints[name] for name in options['only']
+            }
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            results = [
+                self.measure(name, request, options)
+                for name, request in endpoints.items()
+            ]
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.report(results)
+
+    def endpoints(self):
+        """Имя -> функция, выполняющая один запрос и возвращающая ответ."""
+        rng = self.rng
+
+        def get(path, client=None):
+            return lambda: (client or self.client).get(path)
+
+        def tag():
+            return rng.choice(self.tags)[0]
+
+        def word():
+            return rng.choice(self.ingredients)[1].split()[0]
+
+        return {
+            'recipes_list_anonymous': get('/api/recipes/', self.anonymous),
+            'recipes_list': get('/api/recipes/'),
+            'recipes_list_page_50': get('/api/recipes/?page=50'),
+            'recipes_list_cursor': get('/api/recipes/?pagination=cursor'),
+            'recipes_filter_tags': lambda: self.client.get(
+                f'/api/recipes/?tags={tag()}&tags={tag()}'
+            ),
+            'recipes_favorited': get('/api/recipes/?is_favorited=1'),
+            'recipes_search': lambda: self.client.get(
+                f'/api/recipes/?search={word()}'
+            ),
+            'recipes_popular': get('/api/recipes/?ordering=popular'),
+            'recipe_detail': lambda: self.client.get(
+                f'/api/recipes/{rng.choice(self.recipe_ids)}/'
+            ),
+            'recipes_feed': get('/api/recipes/feed/'),
+            'subscriptions': get(
+                '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            'ingredients_autocomplete': lambda: self.client.get(
+                f'/api/ingredients/?name={word()[:3]}'
+            ),
+            'download_shopping_cart': get(
+                '/api/recipes/download_shopping_cart/'
+            ),
+            'recipe_create': self.create_recipe,
+        }
+
+    def create_recipe(self):
+        rng = self.rng
+        with transaction.atomic():
+            response = self.client.post(
+                '/api/recipes/',
+                json.dumps({
+                    'tags': [pk for _, pk in rng.sample(
+                        self.tags, min(2, len(self.tags))
+                    )],
+                    'ingredients': [
+                        {'id': pk, 'amount': rng.randint(1, 500)}
+                        for pk, _ in rng.sample(
+                            self.ingredients, min(8, len(self.ingredients))
+                        )
+                    ],
+                    'image': image_data(),
+                    'name': 'Замер',
+                    'text': 'Рецепт для замера скорости.',
+                    'cooking_time': 10,
+                }),
+                content_type='application/json',
+            )
+            transaction.set_rollback(True)
+        return response
+
+    def measure(self, name, request, options):
+        for _ in range(options['warmup']):
+            request()
+        timings = []
+        queries = []
+        statuses = set()
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = request()
+                if response.streaming:
+                    # Потоковый ответ выполняет запросы и формирует
+                    # содержимое только при чтении.
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+        return {
+            'endpoint': name,
+            'status': sorted(statuses),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p90_ms': round(percentile(timings, 0.9), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': max(queries),
+        }
+
+    def report(self, results):
+        header = (
+            f'{"эндпоинт":<26} {"код":>7} {"p50 мс":>8} {"p90 мс":>8} '
+            f'{"p99 мс":>8} {"max мс":>8} {"SQL":>4}'
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            status = ','.join(str(code) for code in row['status'])
+            line = (
+                f'{row["endpoint"]:<26} {status:>7} {row["p50_ms"]:>8} '
+                f'{row["p90_ms"]:>8} {row["p99_ms"]:>8} '
+                f'{row["max_ms"]:>8} {row["queries"]:>4}'
+            )
+            if any(code >= 400 for code in row['status']):
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
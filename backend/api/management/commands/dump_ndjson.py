@@ -0,0 +1,31 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from api.ndjson import MODELS, dump_model, snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, рецепты и связи в каталог: по файлу '
+        'JSON Lines на модель, без загрузки таблиц в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для выгрузки.')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        directory.mkdir(parents=True, exist_ok=True)
+        # Все модели читаются в одной транзакции: выгрузка живой базы
+        # не содержит связей на строки, добавленные по ходу выгрузки.
+        with snapshot():
+            for model in MODELS:
+                started = time.monotonic()
+                count = dump_model(model, directory)
+                self.stdout.write(
+                    f'{model._meta.label_lower}: {count} строк за '
+                    f'{time.monotonic() - started:.2f} с'
+                )
+        self.stdout.write(self.style.SUCCESS(f'Выгрузка в {directory}'))
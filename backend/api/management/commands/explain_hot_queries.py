@@ -0,0 +1,138 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes.models import (
+    Favorite,
+    FeedItem,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from recipes.shopping_list import cart_totals
+from users.models import Subscription, User
+
+SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)'),
+}
+
+
+def hot_queries(user, recipe_id, author_id, ingredient_id):
+    """Нагруженные запросы и таблицы, полный просмотр которых допустим.
+
+    Список рецептов постранично читается по первичному ключу в порядке
+    -id, поэтому просмотр recipes_recipe для него ожидаем; сортировка
+    по рейтингу так же читает индекс рейтинга recipes_recipescore.
+    """
+    return (
+        ('favorite_exists', Favorite.objects.filter(
+            user=user, recipe_id=recipe_id
+        ), ()),
+        ('shopping_cart_exists', ShoppingCart.objects.filter(
+            user=user, recipe_id=recipe_id
+        ), ()),
+        ('subscription_exists', Subscription.objects.filter(
+            user=user, author_id=author_id
+        ), ()),
+        ('recipe_favorites', Favorite.objects.filter(
+            recipe_id=recipe_id
+        ), ()),
+        ('recipe_shopping_carts', ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ), ()),
+        ('author_followers', Subscription.objects.filter(
+            author_id=author_id
+        ), ()),
+        ('author_recipes', Recipe.objects.filter(
+            author_id=author_id
+        ), ()),
+        ('tag_recipes', Recipe.objects.filter(tags__id=1), ()),
+        ('ingredient_recipes', IngredientRecipe.objects.filter(
+            ingredient_id=ingredient_id
+        ), ()),
+        ('recipe_list_flags', Recipe.objects.with_user_flags(user)[:10], (
+            'recipes_recipe',
+        )),
+        ('filter_is_favorited', Recipe.objects.with_user_flags(user).filter(
+            is_favorited=True
+        )[:10], ('recipes_recipe',)),
+        ('shopping_list', ShoppingListItem.objects.filter(user=user), ()),
+        ('cart_totals', cart_totals([user.pk]), ()),
+        ('feed_pushed', FeedItem.objects.filter(
+            user=user
+        ).order_by('-recipe_id')[:10], ()),
+        ('feed_pulled', Recipe.objects.filter(
+            feed_fanout=False,
+            author__in=Subscription.objects.filter(user=user).values('author'),
+        ).order_by('-id')[:10], ()),
+        ('order_popular', Recipe.objects.order_by_score(
+            'popularity'
+        )[:10], ('recipes_recipescore',)),
+        ('favorites_since', Favorite.objects.filter(
+            created__gte=timezone.now()
+        ), ()),
+        ('ingredient_match', Recipe.objects.matching_ingredients(
+            [ingredient_id]
+        )[:10], ()),
+    )
+
+
+def explain(queryset):
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Без этого на маленьких таблицах планировщик выбирает
+            # полный просмотр даже при наличии подходящего индекса.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для нагруженных запросов и сообщает '
+        'о полных просмотрах таблиц.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Завершиться с ошибкой, если найден полный просмотр.',
+        )
+
+    def handle(self, *args, **options):
+        pattern = SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(
+                f'БД {connection.vendor} не поддерживается.'
+            )
+        user = User.objects.order_by('pk').first() or User(pk=1)
+        recipe = Recipe.objects.order_by('pk').first()
+        ingredient = IngredientRecipe.objects.order_by('pk').first()
+        queries = hot_queries(
+            user,
+            recipe.pk if recipe else 1,
+            recipe.author_id if recipe else 1,
+            ingredient.ingredient_id if ingredient else 1,
+        )
+        failed = []
+        for name, queryset, allowed in queries:
+            plan = explain(queryset)
+            scans = sorted(set(pattern.findall(plan)) - set(allowed))
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+            if scans:
+                failed.append(name)
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: полный просмотр {", ".join(scans)}'
+                ))
+            else:
+                self.stdout.write(f'{name}: OK')
+        if failed and options['fail_on_scan']:
+            raise CommandError(
+                f'Полный просмотр таблиц в запросах: {", ".join(failed)}'
+            )
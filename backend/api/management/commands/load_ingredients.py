@@ -0,0 +1,188 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+
+from api.versions import bump_version
+from recipes.autocomplete import invalidate_trie
+from recipes.models import Ingredient
+
+DEFAULT_PATH = Path(settings.BASE_DIR).parent / 'data' / 'ingredients.csv'
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file, delimiter):
+    for line, row in enumerate(csv.reader(file, delimiter=delimiter), 1):
+        if not row:
+            continue
+        if len(row) != 2:
+            raise CommandError(
+                f'Строка {line}: ожидается название и единица измерения.'
+            )
+        yield line, row[0], row[1]
+
+
+def read_json(file):
+    """Читает массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов.')
+    buffer = buffer[1:]
+    number = 0
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise CommandError(
+                    f'Некорректный JSON после элемента {number}.'
+                )
+            buffer += chunk
+            continue
+        number += 1
+        buffer = buffer[end:]
+        try:
+            yield number, item['name'], item['measurement_unit']
+        except (KeyError, TypeError):
+            raise CommandError(
+                f'Элемент {number}: ожидаются поля name и measurement_unit.'
+            )
+
+
+def clean_rows(rows):
+    max_lengths = {
+        field: Ingredient._meta.get_field(field).max_length
+        for field in ('name', 'measurement_unit')
+    }
+    for line, name, unit in rows:
+        name, unit = str(name).strip(), str(unit).strip()
+        if not name or not unit:
+            raise CommandError(f'Строка {line}: пустое значение.')
+        if (
+            len(name) > max_lengths['name']
+            or len(unit) > max_lengths['measurement_unit']
+        ):
+            raise CommandError(f'Строка {line}: слишком длинное значение.')
+        yield name, unit
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_bulk(connection, rows, batch_size):
+    """Вставка пачками; уже существующие ингредиенты пропускаются."""
+    read = 0
+    for chunk in chunks(rows, batch_size):
+        Ingredient.objects.using(connection.alias).bulk_create([
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in chunk
+        ], ignore_conflicts=True)
+        read += len(chunk)
+    return read
+
+
+def load_copy(connection, rows, batch_size):
+    """COPY во временную таблицу и одна вставка с ON CONFLICT DO NOTHING."""
+    quote = connection.ops.quote_name
+    read = 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE ingredient_import '
+            '(name text, measurement_unit text) ON COMMIT DROP'
+        )
+        for chunk in chunks(rows, batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(chunk)
+            buffer.seek(0)
+            cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+            read += len(chunk)
+        cursor.execute(
+            'INSERT INTO {table} ({name}, {unit}) '
+            'SELECT DISTINCT name, measurement_unit FROM ingredient_import '
+            'ON CONFLICT DO NOTHING'.format(
+                table=quote(Ingredient._meta.db_table),
+                name=quote(Ingredient._meta.get_field('name').column),
+                unit=quote(
+                    Ingredient._meta.get_field('measurement_unit').column
+                ),
+            )
+        )
+    return read
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV (название;единица) или JSON. '
+        'Уже существующие пары название/единица пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=str(DEFAULT_PATH),
+            help='Файл .csv или .json, по умолчанию data/ingredients.csv.',
+        )
+        parser.add_argument(
+            '--delimiter',
+            default=';',
+            help='Разделитель столбцов CSV.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Число строк в одной пачке.',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if path.suffix not in ('.csv', '.json'):
+            raise CommandError('Поддерживаются файлы .csv и .json.')
+        connection = connections[router.db_for_write(Ingredient)]
+        load = load_copy if connection.vendor == 'postgresql' else load_bulk
+        started = time.monotonic()
+        try:
+            file = path.open(encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть {path}: {error}')
+        with file, transaction.atomic(using=connection.alias):
+            before = Ingredient.objects.using(connection.alias).count()
+            if path.suffix == '.csv':
+                rows = read_csv(file, options['delimiter'])
+            else:
+                rows = read_json(file)
+            read = load(connection, clean_rows(rows), options['batch_size'])
+            created = Ingredient.objects.using(
+                connection.alias
+            ).count() - before
+            if created:
+                # Массовая вставка идет без сигналов.
+                bump_version(Ingredient)
+                invalidate_trie()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {read}, добавлено ингредиентов: {created} '
+            f'за {elapsed:.2f} с ({read / max(elapsed, 1e-6):.0f} строк/с)'
+        ))
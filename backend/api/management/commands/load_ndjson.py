@@ -0,0 +1,66 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ndjson import MODELS, Checkpoint, load_model, reset_sequences
+from api.signals import VERSIONED_MODELS
+from api.versions import bump_version
+from recipes.autocomplete import invalidate_trie
+from recipes.scores import create_missing_scores
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку dump_ndjson. Прерванная загрузка '
+        'продолжается с последней сохраненной пачки; строки с уже '
+        'существующими id пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с выгрузкой.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Число строк в одной транзакции.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать загрузку заново, не учитывая сохраненную позицию.',
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if not directory.is_dir():
+            raise CommandError(f'Каталог {directory} не найден.')
+        checkpoint = Checkpoint(directory)
+        if options['restart']:
+            checkpoint.clear()
+        for model in MODELS:
+            started = time.monotonic()
+            resumed = checkpoint.get(model)
+            count = load_model(
+                model, directory, checkpoint, options['batch_size']
+            )
+            message = (
+                f'{model._meta.label_lower}: {count} строк за '
+                f'{time.monotonic() - started:.2f} с'
+            )
+            if resumed:
+                message += f' (продолжено со строки {resumed + 1})'
+            self.stdout.write(message)
+        reset_sequences(MODELS)
+        # Поисковый индекс не выгружается, а версии и кэш автодополнения
+        # не знают о вставке в обход сигналов. Строки рейтинга есть
+        # в выгрузке, но рецепту без рейтинга нужна пустая строка, иначе
+        # он не попадет в сортировку по рейтингу.
+        rebuild_search_index()
+        create_missing_scores()
+        for model in VERSIONED_MODELS:
+            bump_version(model)
+        invalidate_trie()
+        checkpoint.clear()
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
@@ -0,0 +1,275 @@
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from api.signals import VERSIONED_MODELS
+from api.versions import bump_version
+from recipes.autocomplete import invalidate_trie
+from recipes.counters import recount
+from recipes.feed import rebuild_feed
+from recipes.images import make_variants
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from recipes.scores import refresh_scores
+from recipes.search import rebuild_search_index
+from recipes.shopping_list import rebuild_shopping_list
+from users.models import Subscription, User
+
+PASSWORD = 'benchmark'
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F4A261', 'dessert'),
+    ('Выпечка', '#2A9D8F', 'bakery'),
+)
+MIN_INGREDIENTS = 50
+ACTIVITY_DAYS = 30
+IMAGE_NAME = 'recipes/benchmark.jpg'
+IMAGE_SIZE = (1200, 800)
+
+
+class Zipf:
+    """Выбор элементов с вероятностью, убывающей по степенному закону.
+
+    Порядок элементов перемешивается, чтобы популярность не совпадала
+    с порядком id.
+    """
+
+    def __init__(self, rng, items, exponent=1.1):
+        self.rng = rng
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** exponent for rank in range(len(self.items))
+        ))
+
+    def sample(self, count):
+        """До count различных элементов."""
+        return set(self.rng.choices(
+            self.items, cum_weights=self.cum_weights, k=count
+        ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет БД синтетическими пользователями, рецептами, '
+        'подписками, избранным и корзинами для нагрузочных замеров. '
+        f'Пароль созданных пользователей - {PASSWORD}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее число рецептов в избранном пользователя.',
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Среднее число рецептов в корзине пользователя.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def stage(self, name, function, *args):
+        started = time.monotonic()
+        result = function(*args)
+        self.stdout.write(
+            f'{name}: {time.monotonic() - started:.2f} с'
+        )
+        return result
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        image = self.stage('Фото', self.create_image)
+        with transaction.atomic():
+            users = self.stage(
+                'Пользователи', self.create_users, options['users']
+            )
+            tags = self.stage('Теги', self.create_tags)
+            ingredients = self.stage('Ингредиенты', self.create_ingredients)
+            recipes = self.stage(
+                'Рецепты', self.create_recipes,
+                users, tags, ingredients, image, options['recipes'],
+            )
+            self.stage(
+                'Подписки', self.create_subscriptions,
+                users, options['follows'],
+            )
+            self.stage(
+                'Избранное', self.create_links,
+                Favorite, users, recipes, options['favorites'],
+            )
+            self.stage(
+                'Корзины', self.create_links,
+                ShoppingCart, users, recipes, options['carts'],
+            )
+            # Массовая вставка идет без сигналов: производные данные
+            # пересчитываются целиком.
+            self.stage('Счетчики', recount)
+            self.stage('Списки покупок', rebuild_shopping_list)
+            self.stage('Ленты', rebuild_feed)
+            self.stage('Рейтинги', refresh_scores)
+            self.stage('Поисковый индекс', rebuild_search_index)
+            for model in VERSIONED_MODELS:
+                bump_version(model)
+        invalidate_trie()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, рецептов: {len(recipes)}'
+        ))
+
+    def bulk_create(self, model, objects):
+        batch = []
+        for item in objects:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def new_pks(self, model, last_pk):
+        # На SQLite bulk_create не возвращает id созданных строк.
+        return list(model.objects.filter(
+            pk__gt=last_pk
+        ).values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+    def created(self):
+        return self.now - timedelta(
+            seconds=self.rng.uniform(0, ACTIVITY_DAYS * 24 * 3600)
+        )
+
+    def create_image(self):
+        """Общее фото рецептов с готовыми уменьшенными копиями.
+
+        Рецепты вставляются без сигналов, поэтому копии готовятся здесь
+        один раз, а не фоновыми задачами на каждый рецепт.
+        """
+        image = Image.merge('RGB', (
+            Image.linear_gradient('L').resize(IMAGE_SIZE),
+            Image.radial_gradient('L').resize(IMAGE_SIZE),
+            Image.new('L', IMAGE_SIZE, 128),
+        ))
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        name = default_storage.save(
+            IMAGE_NAME, ContentFile(buffer.getvalue())
+        )
+        return {'source': name, **make_variants(name)}
+
+    def create_users(self, count):
+        last_pk = self.last_pk(User)
+        password = make_password(PASSWORD)
+        self.bulk_create(User, (
+            User(
+                username=f'bench{last_pk + number}',
+                email=f'bench{last_pk + number}@example.com',
+                first_name='Тест',
+                last_name=f'Пользователь {last_pk + number}',
+                password=password,
+            )
+            for number in range(1, count + 1)
+        ))
+        return self.new_pks(User, last_pk)
+
+    def create_tags(self):
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color},
+            )
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def create_ingredients(self):
+        missing = MIN_INGREDIENTS - Ingredient.objects.count()
+        if missing > 0:
+            self.bulk_create(Ingredient, (
+                Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+                for number in range(missing)
+            ))
+        return list(Ingredient.objects.values_list('pk', 'name'))
+
+    def create_recipes(self, users, tags, ingredients, image, count):
+        rng = self.rng
+        authors = Zipf(rng, users)
+        popular_ingredients = Zipf(rng, ingredients)
+        last_pk = self.last_pk(Recipe)
+        compositions = []
+        recipes = []
+        for _ in range(count):
+            composition = popular_ingredients.sample(rng.randint(3, 12))
+            compositions.append(composition)
+            names = [name for _, name in composition]
+            recipes.append(Recipe(
+                author_id=authors.sample(1).pop(),
+                name=f'{names[0].capitalize()} по-домашнему',
+                text='Смешать: ' + ', '.join(names) + '.',
+                cooking_time=rng.randint(5, 180),
+                image=image['source'],
+                image_variants=image,
+            ))
+        self.bulk_create(Recipe, recipes)
+        pks = self.new_pks(Recipe, last_pk)
+        self.bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=pk, tag_id=tag)
+            for pk in pks
+            for tag in rng.sample(tags, rng.randint(1, min(3, len(tags))))
+        ))
+        self.bulk_create(IngredientRecipe, (
+            IngredientRecipe(
+                recipe_id=pk, ingredient_id=ingredient,
+                amount=rng.randint(1, 500),
+            )
+            for pk, composition in zip(pks, compositions)
+            for ingredient, _ in composition
+        ))
+        return pks
+
+    def counts(self, users, mean):
+        # Экспоненциальное распределение: большинство пользователей
+        # малоактивны, немногие - очень активны.
+        for user in users:
+            yield user, max(1, round(self.rng.expovariate(1 / mean)))
+
+    def create_subscriptions(self, users, mean):
+        authors = Zipf(self.rng, users)
+        self.bulk_create(Subscription, (
+            Subscription(user_id=user, author_id=author)
+            for user, count in self.counts(users, mean)
+            for author in authors.sample(count)
+            if author != user
+        ))
+
+    def create_links(self, model, users, recipes, mean):
+        popular = Zipf(self.rng, recipes)
+        self.bulk_create(model, (
+            model(user_id=user, recipe_id=recipe, created=self.created())
+            for user, count in self.counts(users, mean)
+            for recipe in popular.sample(count)
+        ))
@@ -0,0 +1,159 @@
+import threading
+from collections import Counter, defaultdict
+
+from .cache import cache_stats
+
+# Границы корзин гистограмм: секунды и число SQL-запросов.
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """Пары (le, накопленное число наблюдений), включая +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield str(bound), total
+        yield '+Inf', self.count
+
+
+class ViewStats:
+
+    def __init__(self):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.db_duration = Histogram(SECONDS_BUCKETS)
+        self.serializer_duration = Histogram(SECONDS_BUCKETS)
+        self.db_queries = Histogram(QUERIES_BUCKETS)
+        self.response_bytes = 0
+        self.statuses = Counter()
+
+
+# Статистика запросов текущего процесса по (view, method).
+view_stats = defaultdict(ViewStats)
+_lock = threading.Lock()
+
+
+def observe_request(
+    view, method, status, duration, queries, db_duration,
+    serializer_duration, size,
+):
+    with _lock:
+        stats = view_stats[(view, method)]
+        stats.duration.observe(duration)
+        stats.db_duration.observe(db_duration)
+        stats.serializer_duration.observe(serializer_duration)
+        stats.db_queries.observe(queries)
+        stats.response_bytes += size
+        stats.statuses[status] += 1
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace(
+            '"', r'\"'
+        ).replace('\n', r'\n')
+
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in labels.items()
+    ) + '}'
+
+
+def _histogram(lines, name, help_text, histograms):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for labels, histogram in histograms:
+        for bound, count in histogram.samples():
+            lines.append(
+                f'{name}_bucket{_labels(**labels, le=bound)} {count}'
+            )
+        lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum}')
+        lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+
+
+def render_metrics():
+    """Метрики процесса в текстовом формате Prometheus.
+
+    Каждый процесс gunicorn считает свои запросы, поэтому метрики
+    нужно собирать с каждого воркера или суммировать по экземплярам.
+    """
+    with _lock:
+        items = sorted(view_stats.items())
+        lines = []
+        _histogram(
+            lines, 'foodgram_request_duration_seconds',
+            'Время обработки запроса.',
+            [
+                ({'view': view, 'method': method}, stats.duration)
+                for (view, method), stats in items
+            ],
+        )
+        _histogram(
+            lines, 'foodgram_request_db_duration_seconds',
+            'Время SQL-запросов за один запрос к API.',
+            [
+                ({'view': view, 'method': method}, stats.db_duration)
+                for (view, method), stats in items
+            ],
+        )
+        _histogram(
+            lines, 'foodgram_request_serializer_duration_seconds',
+            'Время сериализаторов без SQL за один запрос к API.',
+            [
+                ({'view': view, 'method': method}, stats.serializer_duration)
+                for (view, method), stats in items
+            ],
+        )
+        _histogram(
+            lines, 'foodgram_request_db_queries',
+            'Число SQL-запросов за один запрос к API.',
+            [
+                ({'view': view, 'method': method}, stats.db_queries)
+                for (view, method), stats in items
+            ],
+        )
+        lines.append(
+            '# HELP foodgram_response_bytes_total Размер ответов.'
+        )
+        lines.append('# TYPE foodgram_response_bytes_total counter')
+        for (view, method), stats in items:
+            lines.append(
+                'foodgram_response_bytes_total'
+                f'{_labels(view=view, method=method)} {stats.response_bytes}'
+            )
+        lines.append('# HELP foodgram_requests_total Число запросов.')
+        lines.append('# TYPE foodgram_requests_total counter')
+        for (view, method), stats in items:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(
+                    'foodgram_requests_total'
+                    f'{_labels(view=view, method=method, status=status)} '
+                    f'{count}'
+                )
+    lines.append(
+        '# HELP foodgram_response_cache_total Обращения к кэшу ответов.'
+    )
+    lines.append('# TYPE foodgram_response_cache_total counter')
+    for (prefix, result), count in sorted(cache_stats.items()):
+        lines.append(
+            'foodgram_response_cache_total'
+            f'{_labels(cache=prefix, result=result)} {count}'
+        )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,216 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+# Списки параметров IN (%s, %s, ...) разной длины - один шаблон.
+PARAMS_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+REPEATED_QUERIES_SHOWN = 3
+
+
+def sql_template(sql):
+    return PARAMS_LIST_RE.sub('(...)', sql)
+
+
+class QueryCollector:
+    """Обертка выполнения SQL: число, время и шаблоны запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.templates = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.templates[sql_template(sql)] += 1
+
+    def repeated(self):
+        """Самые частые шаблоны, выполненные больше одного раза."""
+        return [
+            (template, count)
+            for template, count in self.templates.most_common(
+                REPEATED_QUERIES_SHOWN
+            )
+            if count > 1
+        ]
+
+
+@contextmanager
+def collect_queries(collector):
+    """Подключает collector ко всем соединениям с БД."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(collector))
+        yield
+
+
+class MeteredContent:
+    """Тело потокового ответа: SQL при выдаче частей и число байт.
+
+    collector подключается только на время получения очередной части,
+    чтобы не остаться на соединении, если тело так и не дочитают.
+    on_close(size) вызывается один раз: когда тело выдано целиком
+    или ответ закрыт раньше.
+    """
+
+    def __init__(self, content, collector, on_close):
+        self.content = iter(content)
+        self.collector = collector
+        self.on_close = on_close
+        self.size = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with collect_queries(self.collector):
+            try:
+                chunk = next(self.content)
+            except StopIteration:
+                self.close()
+                raise
+        self.size += len(chunk)
+        return chunk
+
+    def close(self):
+        # Исходный итератор закрывает сам ответ.
+        if not self.closed:
+            self.closed = True
+            self.on_close(self.size)
+
+
+class SerializerTimer:
+    """Время работы сериализаторов за запрос без их SQL-запросов.
+
+    Учитываются только внешние вызовы: вложенные сериализаторы уже
+    входят во время родителя.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.duration = 0
+        self.depth = 0
+
+    def measure(self, function, *args):
+        if self.depth:
+            return function(*args)
+        self.depth = 1
+        started = time.perf_counter()
+        db_started = self.collector.duration
+        try:
+            return function(*args)
+        finally:
+            self.depth = 0
+            self.duration += (
+                time.perf_counter() - started
+                - (self.collector.duration - db_started)
+            )
+
+
+# Замер сериализаторов текущего запроса, None вне middleware.
+serializer_timer = ContextVar('serializer_timer', default=None)
+
+
+class RequestMetricsMiddleware:
+    """Замеры времени, SQL-запросов и размера ответа каждого запроса.
+
+    Время сериализаторов (см. api.mixins.SerializerTimingMixin)
+    отделяется от остальной работы представления и от SQL.
+    Добавляет заголовок Server-Timing, копит гистограммы для
+    /api/metrics/ и пишет в лог запросы дольше SLOW_REQUEST_MS
+    вместе с повторяющимися SQL-запросами - признаком N+1.
+
+    Тело потокового ответа (StreamingHttpResponse) формируется уже
+    после отправки заголовков, поэтому Server-Timing у него описывает
+    только работу до начала выдачи тела. Гистограммы и лог медленных
+    запросов пишутся, когда тело выдано целиком или ответ закрыт, и
+    учитывают время, SQL-запросы и размер всего тела.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        timer = SerializerTimer(collector)
+        token = serializer_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            with collect_queries(collector):
+                response = self.get_response(request)
+        finally:
+            serializer_timer.reset(token)
+        total = time.perf_counter() - started
+        # view - работа представления вместе с сериализаторами,
+        # render - перевод данных ответа в JSON или CSV.
+        view_done = getattr(request, 'metrics_view_done', None)
+        view_started = getattr(request, 'metrics_view_started', started)
+        view = (view_done or started + total) - view_started
+        render = started + total - view_done if view_done else 0
+        app = max(view - collector.duration - timer.duration, 0)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={collector.duration * 1000:.1f};'
+            f'desc="{collector.count} queries"',
+            f'app;dur={app * 1000:.1f}',
+            f'serializer;dur={timer.duration * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        observe = partial(
+            self.observe, request, response, started, collector, timer
+        )
+        if response.streaming:
+            response.streaming_content = MeteredContent(
+                response.streaming_content, collector, observe
+            )
+        else:
+            observe(len(response.content))
+        return response
+
+    def observe(self, request, response, started, collector, timer, size):
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unmatched'
+        observe_request(
+            view_name, request.method, response.status_code, total,
+            collector.count, collector.duration, timer.duration, size,
+        )
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            self.log_slow(request, view_name, total, collector, timer)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Ответы DRF отрисовываются после выхода из представления.
+        request.metrics_view_done = time.perf_counter()
+        return response
+
+    def log_slow(self, request, view_name, total, collector, timer):
+        repeated = ''.join(
+            f'\n  {count} x {template}'
+            for template, count in collector.repeated()
+        )
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f мс, SQL: %d за %.0f мс, '
+            'сериализаторы: %.0f мс%s',
+            request.method, request.get_full_path(), view_name,
+            total * 1000, collector.count, collector.duration * 1000,
+            timer.duration * 1000, repeated,
+        )
@@ -0,0 +1,81 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .middleware import serializer_timer
+from .versions import get_versions
+
+
+class ConditionalGetMixin:
+    """Поддержка ETag и Last-Modified для чтения во вьюсетах.
+
+    Метка ответа строится по счетчикам изменений version_models,
+    поэтому на совпавший If-None-Match/If-Modified-Since отдается 304
+    без выборки данных и сериализации.
+    """
+
+    version_models = ()
+    conditional_actions = ('list', 'retrieve')
+
+    def get_conditional_parts(self, request, *args, **kwargs):
+        """Данные помимо версий моделей, от которых зависит ответ.
+
+        None отключает условный ответ для запроса.
+        """
+        return ()
+
+    def use_last_modified(self, request):
+        return True
+
+    def conditional(self, handler, request, *args, **kwargs):
+        parts = self.get_conditional_parts(request, *args, **kwargs)
+        if parts is None:
+            return handler(request, *args, **kwargs)
+        versions, modified = get_versions(self.version_models)
+        etag = quote_etag(hashlib.md5(repr((
+            versions,
+            request.get_full_path(),
+            request.accepted_media_type,
+            parts,
+        )).encode()).hexdigest())
+        last_modified = None
+        if modified is not None and self.use_last_modified(request):
+            last_modified = int(modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if 'list' not in self.conditional_actions:
+            return super().list(request, *args, **kwargs)
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'retrieve' not in self.conditional_actions:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class SerializerTimingMixin:
+    """Учитывает время to_representation в метриках запроса.
+
+    Подмешивается к сериализаторам ответов; для many=True замеряется
+    каждый элемент списка, вложенные сериализаторы - в составе
+    внешнего.
+    """
+
+    def to_representation(self, instance):
+        timer = serializer_timer.get()
+        if timer is None:
+            return super().to_representation(instance)
+        return timer.measure(super().to_representation, instance)
@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class ModelVersion(models.Model):
+    """Счетчик изменений модели для условных GET-запросов."""
+
+    label = models.CharField(
+        max_length=100,
+        verbose_name='Модель',
+        unique=True,
+    )
+    version = models.PositiveBigIntegerField(
+        verbose_name='Версия',
+        default=0,
+    )
+    modified = models.DateTimeField(
+        verbose_name='Время изменения',
+    )
+
+    class Meta:
+        verbose_name = 'Версия модели'
+        verbose_name_plural = 'Версии моделей'
+
+    def __str__(self):
+        return f'{self.label}: {self.version}'
@@ -0,0 +1,183 @@
+import datetime
+import json
+import os
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+
+from recipes.models import (
+    Favorite,
+    FeedItem,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    RecipeScore,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+from users.models import Subscription, User
+
+# Модели в порядке зависимостей: каждая ссылается только на предыдущие.
+MODELS = (
+    User,
+    Subscription,
+    Tag,
+    Ingredient,
+    Recipe,
+    Recipe.tags.through,
+    IngredientRecipe,
+    Favorite,
+    ShoppingCart,
+    ShoppingListItem,
+    FeedItem,
+    RecipeScore,
+)
+# Поля, которые не выгружаются и пересчитываются после загрузки.
+EXCLUDED_FIELDS = {
+    Recipe: ('search_vector',),
+}
+CHECKPOINT_NAME = 'checkpoint.json'
+
+
+def model_fields(model):
+    excluded = EXCLUDED_FIELDS.get(model, ())
+    return [
+        field for field in model._meta.concrete_fields
+        if field.name not in excluded
+    ]
+
+
+def model_path(directory, model):
+    return Path(directory) / f'{model._meta.label_lower}.ndjson'
+
+
+class NDJSONEncoder(DjangoJSONEncoder):
+    """Время пишется с микросекундами.
+
+    DjangoJSONEncoder обрезает его до миллисекунд, и после загрузки
+    значения created уже не совпадают с исходными.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+@contextmanager
+def snapshot(using='default'):
+    """Транзакция, в которой все модели читаются из одного снимка базы.
+
+    В PostgreSQL по умолчанию READ COMMITTED: каждый запрос видит свои
+    данные, и связи могут ссылаться на строки, которых нет в выгрузке
+    предыдущих моделей. REPEATABLE READ фиксирует снимок на первом
+    запросе транзакции. SQLite держит снимок в транзакции и так.
+    """
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ '
+                    'READ ONLY'
+                )
+        yield
+
+
+def dump_model(model, directory, chunk_size=2000):
+    """Выгружает модель построчно в порядке первичного ключа.
+
+    Для согласованной выгрузки нескольких моделей вызывается внутри
+    snapshot().
+    """
+    names = [field.attname for field in model_fields(model)]
+    rows = model._base_manager.order_by('pk').values_list(*names)
+    count = 0
+    with model_path(directory, model).open('w', encoding='utf-8') as file:
+        for row in rows.iterator(chunk_size=chunk_size):
+            file.write(json.dumps(
+                dict(zip(names, row)),
+                cls=NDJSONEncoder,
+                ensure_ascii=False,
+            ))
+            file.write('\n')
+            count += 1
+    return count
+
+
+class Checkpoint:
+    """Число загруженных строк каждой модели, сохраняется на диск.
+
+    Файл перезаписывается атомарно после фиксации каждой пачки.
+    """
+
+    def __init__(self, directory):
+        self.path = Path(directory) / CHECKPOINT_NAME
+        self.done = {}
+        if self.path.exists():
+            self.done = json.loads(self.path.read_text())
+
+    def get(self, model):
+        return self.done.get(model._meta.label_lower, 0)
+
+    def save(self, model, lines):
+        self.done[model._meta.label_lower] = lines
+        temporary = self.path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.done))
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        self.done = {}
+        if self.path.exists():
+            self.path.unlink()
+
+
+def load_model(model, directory, checkpoint, batch_size=2000):
+    """Загружает модель пачками, начиная с сохраненной позиции.
+
+    Каждая пачка - отдельная транзакция. Повторная вставка пачки после
+    сбоя до записи позиции безопасна: конфликты пропускаются.
+    Возвращает число загруженных строк.
+    """
+    path = model_path(directory, model)
+    if not path.exists():
+        return 0
+    fields = {field.attname: field for field in model_fields(model)}
+    using = router.db_for_write(model)
+    done = checkpoint.get(model)
+    with path.open(encoding='utf-8') as file:
+        lines = islice(file, done, None)
+        while True:
+            batch = list(islice(lines, batch_size))
+            if not batch:
+                break
+            objects = []
+            for line in batch:
+                values = json.loads(line)
+                objects.append(model(**{
+                    name: fields[name].to_python(value)
+                    for name, value in values.items()
+                }))
+            with transaction.atomic(using=using):
+                model._base_manager.using(using).bulk_create(
+                    objects, ignore_conflicts=True
+                )
+            done += len(batch)
+            checkpoint.save(model, done)
+    return done
+
+
+def reset_sequences(models):
+    """Сдвигает счетчики первичных ключей за загруженные id."""
+    using = router.db_for_write(models[0])
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -1,5 +1,161 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+APPROXIMATE_COUNT_TIMEOUT = 60
+
+
+def estimate_count(queryset):
+    """Приблизительное число строк выборки без полного COUNT(*).
+
+    На PostgreSQL берется оценка планировщика, на остальных БД -
+    точный подсчет, закэшированный на APPROXIMATE_COUNT_TIMEOUT секунд.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        # QuerySet.explain() отдает план строкой в синтаксисе Python,
+        # а psycopg2 сам разбирает JSON из результата EXPLAIN.
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        return int(plan[0]['Plan']['Plan Rows'])
+    key = 'count:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, APPROXIMATE_COUNT_TIMEOUT)
+
+
+def wants_approximate_count(request):
+    return request.query_params.get('count') == 'approx'
+
+
+class ApproximateCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class CursorPaginator(CursorPagination):
+    """Пагинация по ключу без OFFSET и COUNT(*).
+
+    Курсор строится по id, поэтому выборки с другой сортировкой
+    (рейтинг, релевантность поиска, полнота совпадения ингредиентов)
+    отклоняются, а не пересортировываются молча.
+    """
+
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    ordering_conflict_message = (
+        'Пагинация по курсору доступна только для сортировки по умолчанию.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        order_by = tuple(queryset.query.order_by)
+        if order_by and order_by != (self.ordering,):
+            raise ValidationError(
+                {'pagination': [self.ordering_conflict_message]}
+            )
+        self.count = None
+        if wants_approximate_count(request):
+            self.count = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = OrderedDict(
+                [('count', self.count), *response.data.items()]
+            )
+        return response
 
 
 class PageLimitPaginator(PageNumberPagination):
+    """Постраничная пагинация с переключением режимов.
+
+    ?pagination=cursor включает пагинацию по курсору,
+    ?count=approx заменяет точный COUNT(*) оценкой.
+    """
+
     page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if request.query_params.get('pagination') == 'cursor':
+            self.cursor_paginator = CursorPaginator()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        if wants_approximate_count(request):
+            self.django_paginator_class = ApproximateCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+def positive_int(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+class FeedPaginator(BasePagination):
+    """Пагинация ленты по ключу: ?before=<id рецепта>&limit=.
+
+    Страница - рецепты с id меньше before; ссылка next указывает
+    на id последнего рецепта страницы.
+    """
+
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    max_page_size = 100
+    invalid_before_message = 'Некорректное значение before.'
+
+    def paginate_ids(self, request, get_ids):
+        """Страница id, полученных вызовом get_ids(before, limit)."""
+        self.request = request
+        self.limit = min(
+            positive_int(request.query_params.get('limit'))
+            or self.page_size,
+            self.max_page_size,
+        )
+        before = request.query_params.get('before')
+        if before is not None:
+            before = positive_int(before)
+            if before is None:
+                raise NotFound(self.invalid_before_message)
+        # Лишний id показывает, есть ли следующая страница.
+        ids = get_ids(before, self.limit + 1)
+        self.has_next = len(ids) > self.limit
+        ids = ids[:self.limit]
+        self.last_id = ids[-1] if ids else None
+        return ids
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), 'before', self.last_id
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
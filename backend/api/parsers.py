@@ -0,0 +1,41 @@
+import json
+
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class JSONPartData(dict):
+    """Поля из JSON-части запроса.
+
+    Request.data собирается как data.copy() с добавлением файлов через
+    update(); dict.update взял бы из MultiValueDict списки файлов.
+    """
+
+    def copy(self):
+        return JSONPartData(self)
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, MultiValueDict):
+            other = other.dict()
+        super().update(other, **kwargs)
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """multipart/form-data, в котором поля переданы JSON-частью data.
+
+    Файлы передаются отдельными частями и не кодируются в base64.
+    Без части data запрос разбирается как обычная форма.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        if 'data' not in result.data:
+            return result
+        try:
+            data = json.loads(result.data['data'])
+        except ValueError as exc:
+            raise ParseError(f'Ошибка разбора JSON в части data: {exc}')
+        if not isinstance(data, dict):
+            raise ParseError('Часть data должна содержать JSON-объект.')
+        return DataAndFiles(JSONPartData(data), result.files)
@@ -0,0 +1,28 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class FileRenderer(BaseRenderer):
+    """Рендерер для выбора формата выгрузки через ?format=.
+
+    Сами файлы отдаются потоковым ответом в обход рендерера,
+    через него проходят только сообщения об ошибках.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class CSVRenderer(FileRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class TextRenderer(FileRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
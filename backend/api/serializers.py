@@ -1,7 +1,7 @@
-from django.shortcuts import get_object_or_404
+from django.core.files.storage import default_storage
+from django.db import transaction
 from rest_framework import serializers
 from djoser.serializers import UserSerializer, UserCreateSerializer
-from drf_extra_fields.fields import Base64ImageField
 
 from users.models import User, Subscription
 from recipes.models import (
@@ -12,9 +12,45 @@ from recipes.models import (
     ShoppingCart,
     IngredientRecipe,
 )
+from recipes.images import IMAGE_FORMATS
+from recipes.search import schedule_search_update
+from recipes.shopping_list import refresh_recipe_in_carts
+from .fields import StreamingImageField
+from .mixins import SerializerTimingMixin
+from .utils import get_recipes_limit
+from .versions import bump_version
 
+RELATION_BATCH_LIMIT = 100
+MATCH_INGREDIENTS_LIMIT = 100
+EDITABLE_RECIPE_FIELDS = ('image', 'name', 'text', 'cooking_time')
 
-class CustomUserSerializer(UserSerializer):
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """Уменьшенные копии фото в виде {формат: значение srcset}."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image_variants')
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        srcset = {}
+        for key in IMAGE_FORMATS:
+            if key not in variants:
+                continue
+            items = []
+            for width, name in sorted(
+                variants[key].items(), key=lambda item: int(item[0])
+            ):
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                items.append(f'{url} {width}w')
+            srcset[key] = ', '.join(items)
+        return srcset
+
+
+class CustomUserSerializer(SerializerTimingMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -29,13 +65,15 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         if user.is_anonymous:
             return False
         return Subscription.objects.filter(user=user, author=obj).exists()
 
 
-class CustomUserCreateSerializer(UserCreateSerializer):
+class CustomUserCreateSerializer(SerializerTimingMixin, UserCreateSerializer):
     class Meta:
         model = User
         fields = (
@@ -48,7 +86,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SerializerTimingMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Tag
@@ -60,7 +98,7 @@ class TagSerializer(serializers.ModelSerializer):
         )
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SerializerTimingMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
@@ -88,7 +126,7 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class RecipeGetSerializer(SerializerTimingMixin, serializers.ModelSerializer):
 
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer()
@@ -99,6 +137,7 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
@@ -111,11 +150,14 @@ class RecipeGetSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_srcset',
             'text',
             'cooking_time',
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         current_user = self.context['request'].user
         if current_user.is_anonymous:
             return False
@@ -125,6 +167,8 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         current_user = self.context['request'].user
         if current_user.is_anonymous:
             return False
@@ -134,14 +178,48 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         ).exists()
 
 
+class IngredientAmountSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    amount = serializers.FloatField()
+
+
+class RelationBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=RELATION_BATCH_LIMIT,
+    )
+
+    def validate_ids(self, value):
+        # Повторы убираются с сохранением порядка.
+        return list(dict.fromkeys(value))
+
+
+class RecipeMatchParamsSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MATCH_INGREDIENTS_LIMIT,
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+
+class RecipeMatchSerializer(RecipeGetSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = RecipeGetSerializer.Meta.fields + (
+            'coverage',
+            'missing_count',
+        )
+
+
 class RecipeCreateModifySerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(default=serializers.CurrentUserDefault())
-    image = Base64ImageField()
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
-    )
-    ingredients = IngredientRecipeSerializer(many=True,)
+    image = StreamingImageField()
+    tags = serializers.ListField(child=serializers.IntegerField())
+    ingredients = IngredientAmountSerializer(many=True)
 
     class Meta:
         model = Recipe
@@ -156,59 +234,96 @@ class RecipeCreateModifySerializer(serializers.ModelSerializer):
             'cooking_time',
         )
 
-    def validate(self, data):
-        ingredients = self.initial_data.get('ingredients')
+    def validate_ingredients(self, ingredients):
+        """Проверяет ингредиенты за один проход и один запрос к БД."""
         if not ingredients:
-            raise serializers.ValidationError({
-                'ingredients':
+            raise serializers.ValidationError(
                 'Необходимо добавить хотя бы 1 игредиент'
-            })
+            )
+        amounts = {}
         for ingredient_item in ingredients:
-            if ingredients.count(ingredient_item) > 1:
-                raise serializers.ValidationError({
-                    'ingredients':
+            pk = ingredient_item['id']
+            amount = ingredient_item['amount']
+            if pk in amounts:
+                raise serializers.ValidationError(
                     'Ингридиенты должны быть уникальными!'
-                })
-
-            amount = ingredient_item.get('amount')
-            if float(amount) <= 0:
-                raise serializers.ValidationError({
-                    'amount':
+                )
+            if not 0 < amount < float('inf'):
+                raise serializers.ValidationError(
                     'Проверьте, что количество ингредиента больше нуля!'
-                })
-
-        tags = self.initial_data.get('tags')
+                )
+            amounts[pk] = amount
+        found = Ingredient.objects.in_bulk(amounts)
+        missing = [str(pk) for pk in amounts if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {", ".join(missing)}'
+            )
+        return {found[pk]: amount for pk, amount in amounts.items()}
+
+    def validate_tags(self, tags):
         if not tags:
-            raise serializers.ValidationError({
-                'tags': 'Нужно выбрать хотя бы один тэг!'
-            })
-        for tag in tags:
-            if tags.count(tag) > 1:
-                raise serializers.ValidationError({
-                    'tags': 'Тэги должны быть уникальными!'
-                })
-
-        cooking_time = self.initial_data.get('cooking_time')
-        if int(cooking_time) <= 0:
-            raise serializers.ValidationError({
-                'cooking_time': 'Время приготовление должно быть больше нуля!'
-            })
-        data['ingredients'] = ingredients
-        data['tags'] = tags
-        return data
+            raise serializers.ValidationError(
+                'Нужно выбрать хотя бы один тэг!'
+            )
+        unique_tags = set(tags)
+        if len(unique_tags) != len(tags):
+            raise serializers.ValidationError(
+                'Тэги должны быть уникальными!'
+            )
+        found = Tag.objects.in_bulk(unique_tags)
+        missing = [str(pk) for pk in unique_tags if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f'Тэги не найдены: {", ".join(missing)}'
+            )
+        return list(found.values())
 
     def ingredients_creation(self, ingredients, recipe):
         IngredientRecipe.objects.bulk_create(
             [IngredientRecipe(
-                ingredient=get_object_or_404(
-                    Ingredient,
-                    id=ingredient_item.get('id')
-                ),
+                ingredient=ingredient,
                 recipe=recipe,
-                amount=ingredient_item.get('amount')
-            ) for ingredient_item in ingredients]
+                amount=amount
+            ) for ingredient, amount in ingredients.items()]
         )
 
+    def ingredients_update(self, ingredients, recipe):
+        """Применяет к рецепту только изменившиеся ингредиенты."""
+        amounts = {
+            ingredient.pk: amount
+            for ingredient, amount in ingredients.items()
+        }
+        current = {
+            item.ingredient_id: item
+            for item in IngredientRecipe.objects.filter(recipe=recipe)
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for pk, item in current.items():
+            if pk in amounts and item.amount != amounts[pk]:
+                item.amount = amounts[pk]
+                changed.append(item)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        self.ingredients_creation({
+            ingredient: amount
+            for ingredient, amount in ingredients.items()
+            if ingredient.pk not in current
+        }, recipe)
+        # bulk-операции не вызывают сигналы, удаленные строки
+        # пересчитываются сигналом post_delete.
+        touched = [item.ingredient_id for item in changed] + [
+            pk for pk in amounts if pk not in current
+        ]
+        if touched:
+            refresh_recipe_in_carts(recipe.pk, touched)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
@@ -217,114 +332,70 @@ class RecipeCreateModifySerializer(serializers.ModelSerializer):
         self.ingredients_creation(ingredients_data, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.image = validated_data.get('image', instance.image)
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time
-        )
-        tags_data = validated_data.pop('tags')
-        ingredients_data = validated_data.pop('ingredients')
-        instance.tags.clear()
-        instance.ingredients.clear()
-        instance.tags.set(tags_data)
-        self.ingredients_creation(ingredients_data, instance)
-        instance.save()
+        # Счетчики, копии фото и поисковый вектор меняются другими
+        # запросами, пока рецепт редактируется, поэтому сохраняются
+        # только поля из запроса.
+        fields = [
+            field for field in EDITABLE_RECIPE_FIELDS
+            if field in validated_data
+        ]
+        for field in fields:
+            setattr(instance, field, validated_data[field])
+        tags_data = validated_data.pop('tags', None)
+        ingredients_data = validated_data.pop('ingredients', None)
+        if tags_data is not None:
+            instance.tags.set(tags_data)
+        if ingredients_data is not None:
+            self.ingredients_update(ingredients_data, instance)
+            # bulk-операции с ингредиентами не вызывают сигналы версий
+            # и поискового индекса.
+            bump_version(IngredientRecipe)
+            schedule_search_update([instance.pk])
+        if fields:
+            instance.save(update_fields=fields)
         return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = Recipe.objects.with_related(request.user).get(
+            pk=instance.pk
+        )
         return RecipeGetSerializer(
             instance, context=context).data
 
 
-class ShoppingCartValidateSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = ShoppingCart
-        fields = (
-            'user',
-            'recipe',
-        )
-        read_only_fields = (
-            'user',
-            'recipe',
-        )
-
-    def validate(self, data):
-        request = self.context.get('request')
-        user = request.user
-        recipe = self.context.get('recipe')
-        recipe_in_cart = ShoppingCart.objects.filter(
-            user=user, recipe=recipe)
-        if request.method == 'POST':
-            if recipe_in_cart.exists():
-                raise serializers.ValidationError({
-                    'errors': 'Этот рецепт уже добавлен в корзину покупок!'
-                })
-        if request.method == 'DELETE' and not recipe_in_cart.exists():
-            raise serializers.ValidationError({
-                'errors': 'Этого рецепта нет в корзине покупок пользователя!'
-            })
-        return data
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class ShoppingCartSerializer(
+    SerializerTimingMixin, serializers.ModelSerializer
+):
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time',)
 
 
-class FavoriteValidateSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Favorite
-        fields = (
-            'user',
-            'recipe',
-        )
-        read_only_fields = (
-            'user',
-            'recipe',
-        )
-
-    def validate(self, data):
-        request = self.context.get('request')
-        user = request.user
-        recipe = self.context.get('recipe')
-        recipe_in_favorite = Favorite.objects.filter(
-            user=user, recipe=recipe)
-        if request.method == 'POST':
-            if recipe_in_favorite.exists():
-                raise serializers.ValidationError({
-                    'errors': 'Этот рецепт уже есть в избранном!'
-                })
-        if request.method == 'DELETE' and not recipe_in_favorite.exists():
-            raise serializers.ValidationError({
-                'errors': 'Этого рецепта нет в избранном пользователя!'
-            })
-        return data
-
-
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(SerializerTimingMixin, serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time',)
 
 
 class SubscriptionRecipeSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time',)
 
 
 class SubscriptionSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -340,39 +411,8 @@ class SubscriptionSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, obj):
-        limit = self.context['request'].query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit is not None:
-            recipes = obj.recipes.all()[:int(limit)]
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            limit = get_recipes_limit(self.context['request'])
+            recipes = obj.recipes.all()[:limit]
         return SubscriptionRecipeSerializer(recipes, many=True).data
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
-
-class SubscriptionValidateSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Subscription
-        fields = ('user', 'author')
-        read_only_fields = ('user', 'author')
-
-    def validate(self, data):
-        request = self.context.get('request')
-        user = request.user
-        author = self.context.get('author')
-        subscription = Subscription.objects.filter(user=user, author=author)
-        if request.method == 'POST':
-            if subscription.exists():
-                raise serializers.ValidationError({
-                    'errors': 'Такая подписка уже оформлена!'
-                })
-            elif user == author:
-                raise serializers.ValidationError({
-                    'errors': 'Вы не можете подписаться на самого себя!'
-                })
-        if request.method == 'DELETE' and not subscription.exists():
-            raise serializers.ValidationError({
-                'errors': 'Такой подписки не существует!'
-            })
-        return data
@@ -0,0 +1,31 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+from .versions import bump_version
+
+VERSIONED_MODELS = (Tag, Ingredient, Recipe, IngredientRecipe, User)
+
+
+def model_saved(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login и не меняет
+    # данные, которые отдает API.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_version(sender)
+
+
+def model_deleted(sender, **kwargs):
+    bump_version(sender)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(model_saved, sender=model)
+    post_delete.connect(model_deleted, sender=model)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version(Recipe)
@@ -0,0 +1,128 @@
+"""Проверка повторяющихся SQL-запросов (N+1) в тестах API.
+
+Пример для pytest::
+
+    def test_recipes(client):
+        with assert_max_query_repeats(3):
+            client.get('/api/recipes/')
+
+Для TestCase и APITestCase достаточно подмешать QueryRepeatsMixin:
+каждый запрос тестового клиента проверяется автоматически.
+"""
+import os
+import sys
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+import rest_framework
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from .middleware import QueryCollector, sql_template
+
+# Сколько раз один шаблон SQL может выполниться за один запрос к API.
+DEFAULT_MAX_REPEATS = 3
+REST_FRAMEWORK_DIR = os.path.dirname(rest_framework.__file__)
+
+
+def query_origin():
+    """Поле или метод сериализатора, из которого выполняется запрос.
+
+    Берется ближайший кадр стека, принадлежащий сериализатору: метод
+    проекта (например, RecipeGetSerializer.get_is_favorited) или поле,
+    которое обрабатывает to_representation DRF
+    (например, RecipeGetSerializer.author).
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        instance = frame.f_locals.get('self')
+        if isinstance(instance, BaseSerializer):
+            name = type(instance).__name__
+            if not frame.f_code.co_filename.startswith(REST_FRAMEWORK_DIR):
+                return f'{name}.{frame.f_code.co_name}'
+            field = frame.f_locals.get('field')
+            if field is not None and getattr(field, 'field_name', None):
+                return f'{name}.{field.field_name}'
+        frame = frame.f_back
+    return None
+
+
+class OriginQueryCollector(QueryCollector):
+    """Счетчик запросов, запоминающий их источники в сериализаторах."""
+
+    def __init__(self):
+        super().__init__()
+        self.origins = defaultdict(Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.origins[sql_template(sql)][query_origin()] += 1
+        return super().__call__(execute, sql, params, many, context)
+
+    def failures(self, max_repeats):
+        return [
+            (template, count, self.origins[template])
+            for template, count in self.templates.most_common()
+            if count > max_repeats
+        ]
+
+
+def repeated_queries_message(failures, max_repeats):
+    lines = []
+    for template, count, origins in failures:
+        lines.append(
+            f'SQL-запрос выполнен {count} раз '
+            f'(допустимо не более {max_repeats}):'
+        )
+        lines.append(f'  {template}')
+        for origin, origin_count in origins.most_common():
+            lines.append(
+                f'  источник: {origin or "вне сериализаторов"} '
+                f'({origin_count})'
+            )
+    return '\n'.join(lines)
+
+
+@contextmanager
+def assert_max_query_repeats(max_repeats=DEFAULT_MAX_REPEATS):
+    """Падает, если один шаблон SQL выполнен больше max_repeats раз.
+
+    Шаблоны различаются текстом запроса без параметров, списки
+    IN (%s, ...) любой длины считаются одним шаблоном.
+    """
+    collector = OriginQueryCollector()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(collector))
+        yield collector
+    failures = collector.failures(max_repeats)
+    if failures:
+        raise AssertionError(
+            repeated_queries_message(failures, max_repeats)
+        )
+
+
+def guard_client(client, max_repeats=DEFAULT_MAX_REPEATS):
+    """Оборачивает каждый запрос тестового клиента в проверку N+1."""
+    request = client.request
+
+    @wraps(request)
+    def guarded_request(**kwargs):
+        with assert_max_query_repeats(max_repeats):
+            return request(**kwargs)
+
+    client.request = guarded_request
+    return client
+
+
+class QueryRepeatsMixin:
+    """Примесь к TestCase: проверка N+1 для запросов self.client.
+
+    Порог задается атрибутом max_query_repeats класса теста.
+    """
+
+    max_query_repeats = DEFAULT_MAX_REPEATS
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        guard_client(self.client, self.max_query_repeats)
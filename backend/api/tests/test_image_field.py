@@ -0,0 +1,50 @@
+import base64
+from io import BytesIO
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import StreamingImageField
+
+# Регистрирует все форматы Pillow, чтобы проверить поддержку MPO.
+Image.init()
+
+
+def image_bytes(image_format, **options):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), (200, 80, 40)).save(
+        buffer, image_format, **options
+    )
+    return buffer.getvalue()
+
+
+class StreamingImageFieldTest(SimpleTestCase):
+
+    def decode(self, data):
+        return StreamingImageField().to_internal_value(data)
+
+    def test_line_wrapped_base64(self):
+        # encodebytes переносит строки через 76 символов, как MIME.
+        encoded = base64.encodebytes(image_bytes('PNG')).decode()
+        self.assertIn('\n', encoded)
+        file = self.decode(f'data:image/png;base64,{encoded}')
+        self.assertTrue(file.name.endswith('.png'))
+
+    @skipUnless('MPO' in Image.SAVE, 'Pillow не умеет сохранять MPO')
+    def test_mpo_as_jpeg(self):
+        data = image_bytes(
+            'MPO', save_all=True,
+            append_images=[Image.new('RGB', (40, 30))],
+        )
+        encoded = base64.b64encode(data).decode()
+        file = self.decode(f'data:image/jpeg;base64,{encoded}')
+        self.assertTrue(file.name.endswith('.jpg'))
+        self.assertEqual(file.content_type, 'image/jpeg')
+
+    def test_invalid_base64(self):
+        for data in ('data:image/png;base64,abc', 'data:image/png;base64,'):
+            with self.subTest(data=data):
+                with self.assertRaises(ValidationError):
+                    self.decode(data)
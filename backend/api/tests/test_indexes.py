@@ -0,0 +1,32 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+from .utils import APIDataTestCase
+
+
+class HotQueriesIndexesTest(APIDataTestCase):
+    """Нагруженные запросы читают индексы, а не всю таблицу.
+
+    Удаление или порча индекса из миграций проявится здесь как полный
+    просмотр таблицы в плане запроса.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        recipe = cls.recipes[0]
+        Favorite.objects.create(user=cls.user, recipe=recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=recipe.author)
+
+    def test_no_sequential_scans(self):
+        output = StringIO()
+        try:
+            call_command(
+                'explain_hot_queries', fail_on_scan=True, stdout=output
+            )
+        except CommandError as error:
+            self.fail(f'{error}\n{output.getvalue()}')
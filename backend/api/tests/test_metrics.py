@@ -0,0 +1,61 @@
+import re
+from unittest import mock
+
+from django.test import override_settings
+
+from recipes.models import ShoppingCart
+from .utils import APIDataTestCase
+
+TIMING_RE = re.compile(r'(\w+);dur=([\d.]+)')
+
+
+@override_settings(SLOW_REQUEST_MS=10 ** 6)
+class RequestMetricsTest(APIDataTestCase):
+
+    def timings(self, response):
+        return {
+            name: float(value)
+            for name, value in TIMING_RE.findall(response['Server-Timing'])
+        }
+
+    def test_server_timing(self):
+        timings = self.timings(self.client.get('/api/recipes/'))
+        self.assertEqual(
+            set(timings), {'db', 'app', 'serializer', 'render', 'total'}
+        )
+        self.assertGreater(timings['serializer'], 0)
+        self.assertLessEqual(
+            timings['db'] + timings['app'] + timings['serializer']
+            + timings['render'],
+            timings['total'] + 0.5,
+        )
+
+    def test_serializer_histogram(self):
+        self.client.get('/api/tags/')
+        response = self.client.get('/api/metrics/')
+        self.assertIn(
+            'foodgram_request_serializer_duration_seconds_count'
+            '{view="api:tags-list",method="GET"}',
+            response.content.decode(),
+        )
+
+    def test_streaming_response(self):
+        for recipe in self.recipes[:3]:
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        with mock.patch('api.middleware.observe_request') as observe:
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/'
+            )
+            self.assertIn('Server-Timing', response)
+            observe.assert_not_called()
+            content = b''.join(response.streaming_content)
+        observe.assert_called_once()
+        args = observe.call_args.args
+        self.assertEqual(args[0], 'api:recipes-download-shopping-cart')
+        # Выборка списка покупок выполняется уже при выдаче тела.
+        header_queries = int(
+            re.search(r'"(\d+) queries"', response['Server-Timing'])[1]
+        )
+        self.assertGreater(args[4], header_queries)
+        self.assertEqual(args[7], len(content))
+        self.assertGreater(len(content), 0)
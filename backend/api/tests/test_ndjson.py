@@ -0,0 +1,31 @@
+import json
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.ndjson import Checkpoint, load_model, model_path
+from recipes.models import Favorite
+from .utils import APIDataTestCase
+
+
+class NDJSONRoundTripTest(APIDataTestCase):
+    """Выгрузка и загрузка сохраняют время с точностью до микросекунд."""
+
+    recipes_count = 1
+
+    def test_created_keeps_microseconds(self):
+        created = datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc)
+        favorite = Favorite.objects.create(
+            user=self.user, recipe=self.recipes[0], created=created
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('dump_ndjson', directory, stdout=StringIO())
+            line = model_path(directory, Favorite).read_text().splitlines()
+            self.assertEqual(
+                json.loads(line[0])['created'], created.isoformat()
+            )
+            favorite.delete()
+            load_model(Favorite, directory, Checkpoint(directory))
+        self.assertEqual(Favorite.objects.get().created, created)
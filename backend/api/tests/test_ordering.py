@@ -0,0 +1,50 @@
+import json
+import os
+import tempfile
+
+from django.core import serializers
+from django.core.management import call_command
+
+from recipes.models import Favorite, Recipe, RecipeScore
+from recipes.scores import refresh_scores
+from .utils import APIDataTestCase
+
+
+class ScoreOrderingTest(APIDataTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for user in cls.authors:
+            Favorite.objects.create(user=user, recipe=cls.recipes[3])
+        refresh_scores()
+
+    def test_ordering(self):
+        for ordering in ('popular', 'trending'):
+            with self.subTest(ordering=ordering):
+                response = self.client.get(
+                    f'/api/recipes/?ordering={ordering}&limit=100'
+                )
+                data = response.json()
+                self.assertEqual(data['count'], len(self.recipes))
+                self.assertEqual(
+                    data['results'][0]['id'], self.recipes[3].pk
+                )
+
+    def test_loaddata_creates_scores(self):
+        # Фикстуры сохраняются с raw=True, без сигнала, создающего
+        # строку рейтинга.
+        recipe = self.recipes[0]
+        fixture = json.loads(serializers.serialize('json', [recipe]))
+        fixture[0]['pk'] = Recipe.objects.order_by('-pk')[0].pk + 1
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.json', delete=False
+        ) as file:
+            json.dump(fixture, file)
+        self.addCleanup(os.remove, file.name)
+        call_command('loaddata', file.name, verbosity=0)
+        self.assertTrue(
+            RecipeScore.objects.filter(recipe=fixture[0]['pk']).exists()
+        )
+        response = self.client.get('/api/recipes/?ordering=popular')
+        self.assertEqual(response.json()['count'], len(self.recipes) + 1)
@@ -0,0 +1,44 @@
+from api.paginators import estimate_count
+from recipes.models import Recipe
+from .utils import APIDataTestCase
+
+
+class CursorPaginationTest(APIDataTestCase):
+
+    def test_default_ordering(self):
+        response = self.client.get('/api/recipes/?pagination=cursor&limit=4')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        ids = [recipe['id'] for recipe in data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        response = self.client.get(data['next'])
+        self.assertLess(response.json()['results'][0]['id'], ids[-1])
+
+    def test_other_ordering_rejected(self):
+        ingredient = self.ingredients[0].pk
+        for path in (
+            '/api/recipes/?pagination=cursor&ordering=popular',
+            '/api/recipes/?pagination=cursor&search=Рецепт',
+            f'/api/recipes/match/?pagination=cursor&ingredients={ingredient}',
+        ):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('pagination', response.json())
+
+
+class ApproximateCountTest(APIDataTestCase):
+
+    def test_estimate_count(self):
+        # На PostgreSQL - оценка планировщика, поэтому только тип.
+        self.assertIsInstance(estimate_count(Recipe.objects.all()), int)
+
+    def test_approximate_count_param(self):
+        for path in (
+            '/api/recipes/?count=approx',
+            '/api/recipes/?count=approx&pagination=cursor',
+        ):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertIsInstance(response.json()['count'], int)
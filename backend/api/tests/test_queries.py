@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+from .utils import APIDataTestCase
+
+
+class RecipeListQueriesTest(APIDataTestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    recipes_count = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for recipe in cls.recipes[::3]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        for author in cls.authors[::2]:
+            Subscription.objects.create(user=cls.user, author=author)
+
+    def count_queries(self, path):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def assert_same_queries(self, path):
+        self.count_queries(path.format(limit=1))
+        counts = {}
+        for limit in (2, 20, 50):
+            counts[limit], data = self.count_queries(path.format(limit=limit))
+            self.assertEqual(len(data['results']), limit)
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f'Число запросов зависит от limit: {counts}',
+        )
+
+    def test_authenticated(self):
+        self.assert_same_queries('/api/recipes/?limit={limit}')
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assert_same_queries('/api/recipes/?limit={limit}')
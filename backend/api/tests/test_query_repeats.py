@@ -0,0 +1,82 @@
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipeGetSerializer
+from api.testing import assert_max_query_repeats
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+from .utils import APIDataTestCase
+
+
+class QueryRepeatsTest(APIDataTestCase):
+    """Эндпоинты не выполняют запросы на каждую строку ответа."""
+
+    recipes_count = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        for author in cls.authors:
+            Subscription.objects.create(user=cls.user, author=author)
+
+    def get(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return response
+
+    def test_recipes(self):
+        self.get('/api/recipes/?limit=20')
+        self.get('/api/recipes/?is_favorited=1')
+        self.get('/api/recipes/?ordering=popular')
+        self.get(f'/api/recipes/{self.recipes[0].pk}/')
+        self.get('/api/recipes/feed/')
+        ingredients = '&'.join(
+            f'ingredients={ingredient.pk}'
+            for ingredient in self.ingredients[:3]
+        )
+        self.get(f'/api/recipes/match/?{ingredients}')
+
+    def test_recipes_anonymous(self):
+        self.client.force_authenticate(None)
+        self.get('/api/recipes/?limit=20')
+        self.get(f'/api/recipes/{self.recipes[0].pk}/')
+
+    def test_subscriptions(self):
+        self.get('/api/users/subscriptions/?recipes_limit=2')
+
+    def test_users(self):
+        self.get('/api/users/')
+        self.get('/api/users/me/')
+        self.get(f'/api/users/{self.authors[0].pk}/')
+
+    def test_relations(self):
+        recipe = self.recipes[1]
+        for path in (
+            f'/api/recipes/{recipe.pk}/favorite/',
+            f'/api/recipes/{recipe.pk}/shopping_cart/',
+        ):
+            self.assertEqual(self.client.post(path).status_code, 201)
+            self.assertEqual(self.client.delete(path).status_code, 204)
+
+
+class QueryRepeatsGuardTest(APIDataTestCase):
+    """Проверка находит N+1 и указывает поле сериализатора."""
+
+    def test_reports_serializer_origin(self):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = self.user
+        # Без with_related флаги и связи читаются отдельно для рецепта.
+        with self.assertRaises(AssertionError) as context:
+            with assert_max_query_repeats(3):
+                RecipeGetSerializer(
+                    Recipe.objects.all(), many=True,
+                    context={'request': request},
+                ).data
+        message = str(context.exception)
+        self.assertIn(
+            f'RecipeGetSerializer.get_is_favorited ({self.recipes_count})',
+            message,
+        )
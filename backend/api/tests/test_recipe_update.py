@@ -0,0 +1,46 @@
+from api.serializers import RecipeCreateModifySerializer
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.relations import add_relation
+from .utils import APIDataTestCase
+
+
+class RecipeUpdateCountersTest(APIDataTestCase):
+    """Правка рецепта не затирает счетчики, измененные во время нее."""
+
+    recipes_count = 1
+    # Удаленные ингредиенты пересчитываются сигналом post_delete
+    # по одному, а тест удаляет четыре из пяти.
+    max_query_repeats = 6
+
+    def test_stale_instance_keeps_counters(self):
+        stale = Recipe.objects.get(pk=self.recipes[0].pk)
+        add_relation(Favorite, self.user, 'recipe', stale.pk)
+        add_relation(ShoppingCart, self.user, 'recipe', stale.pk)
+        RecipeCreateModifySerializer().update(stale, {'name': 'Новое'})
+        recipe = Recipe.objects.get(pk=stale.pk)
+        self.assertEqual(recipe.name, 'Новое')
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.shopping_cart_count, 1)
+
+    def test_patch(self):
+        recipe = self.recipes[0]
+        self.client.force_authenticate(recipe.author)
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        response = self.client.patch(
+            f'/api/recipes/{recipe.pk}/',
+            {
+                'cooking_time': 25,
+                'ingredients': [
+                    {'id': self.ingredients[0].pk, 'amount': 3},
+                ],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.cooking_time, 25)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(
+            list(recipe.ingredients.values_list('pk', flat=True)),
+            [self.ingredients[0].pk],
+        )
@@ -0,0 +1,29 @@
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+
+from recipes.models import Recipe
+from .utils import APIDataTestCase
+
+
+class SeedBenchmarkImageTest(APIDataTestCase):
+    """Рецепты синтетических данных ссылаются на настоящее фото."""
+
+    recipes_count = 0
+
+    def test_recipes_share_saved_image(self):
+        call_command(
+            'seed_benchmark', users=5, recipes=3, stdout=StringIO()
+        )
+        recipes = Recipe.objects.all()
+        self.assertEqual(len(recipes), 3)
+        self.assertEqual(len({recipe.image.name for recipe in recipes}), 1)
+        recipe = recipes[0]
+        with default_storage.open(recipe.image.name) as file:
+            self.assertEqual(Image.open(file).format, 'JPEG')
+        variants = recipe.image_variants
+        self.assertEqual(variants['source'], recipe.image.name)
+        for name in variants['webp'].values():
+            self.assertTrue(default_storage.exists(name))
@@ -0,0 +1,33 @@
+from django.db import IntegrityError, transaction
+
+from recipes.relations import add_relation
+from users.models import Subscription
+from .utils import APIDataTestCase
+
+
+class SelfSubscriptionTest(APIDataTestCase):
+
+    recipes_count = 0
+
+    def test_rejected_for_any_id_spelling(self):
+        for spelling in (f'{self.user.pk}', f'0{self.user.pk}'):
+            with self.subTest(id=spelling):
+                response = self.client.post(
+                    f'/api/users/{spelling}/subscribe/'
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_constraint(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Subscription.objects.create(user=self.user, author=self.user)
+        # SQLite пропускает нарушение CHECK в INSERT OR IGNORE,
+        # PostgreSQL - нет: ON CONFLICT касается только уникальности.
+        try:
+            with transaction.atomic():
+                add_relation(
+                    Subscription, self.user, 'author', self.user.pk
+                )
+        except IntegrityError:
+            pass
+        self.assertFalse(Subscription.objects.exists())
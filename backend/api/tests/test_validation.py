@@ -0,0 +1,73 @@
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipeCreateModifySerializer
+from recipes.models import Ingredient
+from .utils import APIDataTestCase
+
+INGREDIENTS_COUNT = 1000
+# Запас по времени для медленных машин CI: проверка тысячи
+# ингредиентов занимает около 10 мс.
+TIME_BUDGET = 1.0
+
+
+class IngredientsValidationTest(APIDataTestCase):
+    """Проверка ингредиентов линейна и не делает запросов на строку."""
+
+    recipes_count = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'продукт {number}', measurement_unit='г')
+            for number in range(INGREDIENTS_COUNT)
+        )
+        cls.ingredient_ids = list(Ingredient.objects.filter(
+            name__startswith='продукт'
+        ).values_list('pk', flat=True))
+
+    def serializer(self, ingredients):
+        request = APIRequestFactory().post('/api/recipes/')
+        request.user = self.user
+        return RecipeCreateModifySerializer(
+            data={
+                'tags': [tag.pk for tag in self.tags],
+                'ingredients': ingredients,
+            },
+            partial=True,
+            context={'request': request},
+        )
+
+    def test_many_ingredients(self):
+        serializer = self.serializer([
+            {'id': pk, 'amount': 1} for pk in self.ingredient_ids
+        ])
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            valid = serializer.is_valid()
+            duration = time.perf_counter() - started
+        self.assertTrue(valid, serializer.errors)
+        self.assertEqual(
+            len(serializer.validated_data['ingredients']), INGREDIENTS_COUNT
+        )
+        # Ингредиенты и теги - по одному in_bulk; SQLite делит список
+        # ингредиентов на пачки по числу параметров запроса.
+        batch_size = connection.features.max_query_params or INGREDIENTS_COUNT
+        self.assertLessEqual(
+            len(context.captured_queries),
+            -(-INGREDIENTS_COUNT // batch_size) + 1,
+        )
+        self.assertLess(duration, TIME_BUDGET)
+
+    def test_duplicate_at_end(self):
+        ingredients = [
+            {'id': pk, 'amount': 1} for pk in self.ingredient_ids
+        ]
+        ingredients.append(ingredients[0])
+        serializer = self.serializer(ingredients)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('ingredients', serializer.errors)
@@ -0,0 +1,90 @@
+import shutil
+import tempfile
+
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api.testing import QueryRepeatsMixin
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+
+
+def create_user(number):
+    return User.objects.create_user(
+        email=f'user{number}@example.com',
+        username=f'user{number}',
+        first_name='Имя',
+        last_name=f'Фамилия {number}',
+        password='Pa55word!',
+    )
+
+
+def create_recipes(authors, count, tags, ingredients, per_recipe=5):
+    """Рецепты авторов по очереди, у каждого теги и per_recipe ингредиентов."""
+    recipes = []
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=authors[number % len(authors)],
+            name=f'Рецепт {number}',
+            text='Описание',
+            cooking_time=10,
+            image='recipes/test.jpg',
+        )
+        recipe.tags.set(tags)
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe,
+                ingredient=ingredients[(number + shift) % len(ingredients)],
+                amount=shift + 1,
+            )
+            for shift in range(per_recipe)
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+class APIDataTestCase(QueryRepeatsMixin, APITestCase):
+    """Пользователи, теги, ингредиенты и рецепты для тестов API.
+
+    Загруженные файлы сохраняются во временный MEDIA_ROOT. Запросы
+    self.client проверяются на N+1 (см. api.testing.QueryRepeatsMixin).
+    """
+
+    recipes_count = 10
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.authors = [create_user(number) for number in range(1, 6)]
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag{number}',
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(20)
+        ]
+        cls.recipes = create_recipes(
+            cls.authors, cls.recipes_count, cls.tags, cls.ingredients
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
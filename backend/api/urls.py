@@ -5,7 +5,8 @@ from .views import (
     TagViewSet,
     IngredientViewSet,
     RecipeViewSet,
-    CustomUserViewSet
+    CustomUserViewSet,
+    metrics,
 )
 
 app_name = 'api'
@@ -17,6 +18,7 @@ router_v1.register('recipes', RecipeViewSet, basename='recipes')
 router_v1.register('users', CustomUserViewSet, basename='subscriptions')
 
 urlpatterns = [
+    path('metrics/', metrics, name='metrics'),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
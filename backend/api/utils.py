@@ -1,21 +1,156 @@
 import csv
+import json
+from collections import defaultdict
 
-from django.http.response import HttpResponse
-from django.db.models import Sum
+from django.http import Http404
+from django.http.response import StreamingHttpResponse
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
+from recipes.models import Recipe
+from recipes.relations import (
+    add_relation,
+    add_relations,
+    remove_relation,
+    remove_relations,
+)
 
-def get_csv_shopping_cart(ingredient_recipe):
-    ingredients = ingredient_recipe.values(
-        'ingredient__name', 'ingredient__measurement_unit'
-    ).annotate(ingredient_amount=Sum('amount')).values_list(
-        'ingredient__name', 'ingredient_amount',
-        'ingredient__measurement_unit',
+
+class Echo:
+    """Псевдо-буфер: csv.writer сразу отдает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(ingredients):
+    yield '\ufeff'
+    writer = csv.writer(Echo())
+    for item in ingredients:
+        yield writer.writerow(item)
+
+
+def txt_rows(ingredients):
+    for name, amount, measurement_unit in ingredients:
+        yield f'{name} ({measurement_unit}) — {amount:g}\n'
+
+
+def json_rows(ingredients):
+    separator = '['
+    for name, amount, measurement_unit in ingredients:
+        yield separator + json.dumps({
+            'name': name,
+            'amount': amount,
+            'measurement_unit': measurement_unit,
+        }, ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+SHOPPING_CART_FORMATS = {
+    'csv': ('text/csv', csv_rows),
+    'txt': ('text/plain', txt_rows),
+    'json': ('application/json', json_rows),
+}
+
+
+def get_shopping_cart_response(ingredients, file_format='csv'):
+    """Потоково отдает список покупок в выбранном формате.
+
+    ingredients - выборка кортежей (название, количество, единица
+    измерения); строки читаются из БД итератором и сразу пишутся
+    в ответ, не накапливаясь в памяти.
+    """
+    content_type, rows = SHOPPING_CART_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        rows(ingredients.iterator()),
+        content_type=f'{content_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment;filename="Shoppingcart.{file_format}"'
     )
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = ('attachment;'
-                                       'filename="Shoppingcart.csv"')
-    response.write(u'\ufeff'.encode('utf8'))
-    writer = csv.writer(response)
-    for item in list(ingredients):
-        writer.writerow(item)
     return response
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан."""
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def prefetch_limited_recipes(authors, limit=None):
+    """Подгружает авторам не более limit последних рецептов.
+
+    Рецепты всех авторов выбираются одним запросом: ROW_NUMBER()
+    нумерует рецепты внутри каждого автора, лишние отсекаются в БД.
+    Результат сохраняется в атрибуте limited_recipes каждого автора.
+    """
+    recipes = Recipe.objects.filter(author__in=authors).only(
+        'id', 'name', 'image', 'image_variants', 'cooking_time', 'author',
+    )
+    if limit is not None:
+        ranked = recipes.annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('author'),
+            order_by=F('id').desc(),
+        ))
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) ranked '
+            f'WHERE ranked.row_number <= %s ORDER BY ranked.id DESC',
+            (*params, limit),
+        )
+    grouped = defaultdict(list)
+    for recipe in recipes:
+        grouped[recipe.author_id].append(recipe)
+    for author in authors:
+        author.limited_recipes = grouped[author.pk]
+    return authors
+
+
+def relation_response(request, model, field, target_id, serializer_class,
+                      errors):
+    """Добавляет (POST) или удаляет (DELETE) связь пользователя с объектом.
+
+    Решение принимается по числу затронутых строк единственного
+    запроса на запись; объект ищется только для ответа или ошибки.
+    errors - тексты ошибок для методов POST и DELETE.
+    """
+    target_model = model._meta.get_field(field).related_model
+    try:
+        target_id = int(target_id)
+    except (TypeError, ValueError):
+        raise Http404
+    if request.method == 'POST':
+        if add_relation(model, request.user, field, target_id):
+            serializer = serializer_class(
+                get_object_or_404(target_model, pk=target_id)
+            )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    elif remove_relation(model, request.user, field, target_id):
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    if not target_model.objects.filter(pk=target_id).exists():
+        raise Http404
+    raise ValidationError({'errors': [errors[request.method]]})
+
+
+def batch_relation_response(request, model, field, ids, exclude=()):
+    """Массово добавляет (POST) или удаляет (DELETE) связи с объектами ids.
+
+    Возвращает статус по каждому id в порядке запроса.
+    """
+    if request.method == 'POST':
+        results = add_relations(model, request.user, field, ids, exclude)
+    else:
+        results = remove_relations(model, request.user, field, ids)
+    return Response({'results': [
+        {'id': target_id, 'status': results[target_id]}
+        for target_id in ids
+    ]})
@@ -0,0 +1,35 @@
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ModelVersion
+
+
+def bump_version(model):
+    """Увеличивает счетчик изменений модели."""
+    label = model._meta.label_lower
+    now = timezone.now()
+    updated = ModelVersion.objects.filter(label=label).update(
+        version=F('version') + 1, modified=now,
+    )
+    if not updated:
+        ModelVersion.objects.get_or_create(
+            label=label, defaults={'version': 1, 'modified': now},
+        )
+
+
+def get_versions(models):
+    """Версии и время последнего изменения моделей одним запросом.
+
+    Возвращает кортеж версий в порядке models и самое позднее
+    время изменения (None, если модели еще не менялись).
+    """
+    labels = [model._meta.label_lower for model in models]
+    stored = {
+        label: (version, modified)
+        for label, version, modified in ModelVersion.objects.filter(
+            label__in=labels
+        ).values_list('label', 'version', 'modified')
+    }
+    versions = tuple(stored.get(label, (0, None))[0] for label in labels)
+    modified = [modified for _, modified in stored.values()]
+    return versions, max(modified) if modified else None
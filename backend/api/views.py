@@ -1,17 +1,27 @@
+from functools import partial
+
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
 from djoser.views import UserViewSet
 
+from recipes.feed import feed_recipe_ids
 from recipes.models import (
     Tag,
     Ingredient,
     Recipe,
     IngredientRecipe,
     ShoppingCart,
+    ShoppingListItem,
     Favorite,
 )
 from .serializers import (
@@ -19,32 +29,67 @@ from .serializers import (
     IngredientSerializer,
     RecipeGetSerializer,
     RecipeCreateModifySerializer,
+    RecipeMatchParamsSerializer,
+    RecipeMatchSerializer,
     ShoppingCartSerializer,
-    ShoppingCartValidateSerializer,
     FavoriteSerializer,
-    FavoriteValidateSerializer,
     CustomUserSerializer,
     SubscriptionSerializer,
-    SubscriptionValidateSerializer,
+    RelationBatchSerializer,
 )
+from .cache import get_cached_response_data, response_cache_key
 from .filters import IngredientFilter, RecipeFilter
+from .metrics import render_metrics
+from .mixins import ConditionalGetMixin
+from .paginators import FeedPaginator, positive_int
+from .parsers import MultiPartJSONParser
 from .permissions import IsAuthorAdminOrReadOnly
-from .utils import get_csv_shopping_cart
-from users.models import User, Subscription
+from .renderers import CSVRenderer, TextRenderer
+from .utils import (
+    get_shopping_cart_response,
+    get_recipes_limit,
+    batch_relation_response,
+    prefetch_limited_recipes,
+    relation_response,
+)
+from .versions import get_versions
+from users.models import User, Subscription, subscribed_expression
+
+
+def metrics(request):
+    """Метрики запросов в формате Prometheus."""
+    return HttpResponse(
+        render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+def get_batch_ids(request):
+    serializer = RelationBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
 
 
 class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
 
+    def get_queryset(self):
+        return super().get_queryset().annotate(
+            is_subscribed=subscribed_expression(self.request.user),
+        ).order_by('id')
+
     @action(
         detail=False,
         permission_classes=(IsAuthenticated,),
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user)
+        queryset = User.objects.filter(following__user=user).annotate(
+            is_subscribed=subscribed_expression(user),
+        ).order_by('-id')
         pages = self.paginate_queryset(queryset)
+        prefetch_limited_recipes(pages, get_recipes_limit(request))
         serializer = SubscriptionSerializer(
             pages,
             many=True,
@@ -59,62 +104,161 @@ class CustomUserViewSet(UserViewSet):
         url_path='subscribe',
     )
     def subscribe_unsubscribe(self, request, id):
-        current_user = request.user
-        author = get_object_or_404(User, id=id)
-        serializer = SubscriptionValidateSerializer(
-            data=request.data,
-            context={'request': request, 'author': author}
+        # id сравнивается числом: relation_response принимает и
+        # записи вида 05.
+        if request.method == 'POST' and positive_int(id) == request.user.pk:
+            raise ValidationError({
+                'errors': ['Вы не можете подписаться на самого себя!']
+            })
+        return relation_response(
+            request, Subscription, 'author', id,
+            partial(SubscriptionSerializer, context={'request': request}), {
+                'POST': 'Такая подписка уже оформлена!',
+                'DELETE': 'Такой подписки не существует!',
+            }
         )
-        serializer.is_valid(raise_exception=True)
-        if request.method == 'POST':
-            Subscription.objects.create(user=current_user, author=author)
-            serializer = SubscriptionSerializer(
-                author, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        subscription = Subscription.objects.filter(
-            user=current_user,
-            author=author
+
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path='subscribe/batch',
+    )
+    def subscribe_batch(self, request):
+        return batch_relation_response(
+            request, Subscription, 'author', get_batch_ids(request),
+            exclude=(request.user.pk,),
         )
-        subscription.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    version_models = (Tag,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filter_backends = [DjangoFilterBackend]
     filterset_class = IngredientFilter
+    version_models = (Ingredient,)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeGetSerializer
     filter_backends = [DjangoFilterBackend]
     permission_classes = (IsAuthorAdminOrReadOnly,)
     filterset_class = RecipeFilter
+    parser_classes = (JSONParser, MultiPartJSONParser)
     http_method_names = ['get', 'post', 'patch', 'delete']
+    version_models = (Recipe, IngredientRecipe, Tag, Ingredient, User)
+    conditional_actions = ('retrieve',)
+
+    def get_conditional_parts(self, request, pk=None):
+        user = request.user
+        if user.is_anonymous:
+            return (None,)
+        try:
+            flags = Recipe.objects.filter(pk=pk).with_user_flags(
+                user
+            ).annotate(
+                is_subscribed=subscribed_expression(user, 'author'),
+            ).values_list(
+                'is_favorited', 'is_in_shopping_cart', 'is_subscribed',
+            ).first()
+        except (TypeError, ValueError):
+            return None
+        if flags is None:
+            return None
+        return (user.pk, flags)
+
+    def use_last_modified(self, request):
+        # Флаги пользователя не отражаются во времени изменения.
+        return request.user.is_anonymous
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        versions, _ = get_versions(self.version_models)
+        key = response_cache_key('recipes', request, versions)
+        data = get_cached_response_data('recipes', key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RECIPE_LIST_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def get_queryset(self):
+        if self.request.method == 'GET':
+            return Recipe.objects.with_related(self.request.user)
+        return Recipe.objects.with_user_flags(self.request.user)
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeGetSerializer
         return RecipeCreateModifySerializer
 
+    @action(detail=False)
+    def match(self, request):
+        """Рецепты по имеющимся ингредиентам: сначала самые полные."""
+        params = RecipeMatchParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(
+            self.get_queryset()
+        ).matching_ingredients(params.validated_data['ingredients'])
+        max_missing = params.validated_data.get('max_missing')
+        if max_missing is not None:
+            queryset = queryset.filter(missing_count__lte=max_missing)
+        page = self.paginate_queryset(queryset)
+        serializer = RecipeMatchSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPaginator,
+    )
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь."""
+        ids = self.paginator.paginate_ids(
+            request, partial(feed_recipe_ids, request.user)
+        )
+        recipes = Recipe.objects.with_related(request.user).filter(
+            pk__in=ids
+        ).order_by('-id')
+        serializer = self.get_serializer(recipes, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(CSVRenderer, TextRenderer, JSONRenderer),
     )
     def download_shopping_cart(self, request):
-        ingredient_recipe = IngredientRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
+        ).values_list(
+            'ingredient__name', 'total_amount',
+            'ingredient__measurement_unit',
+        ).order_by('ingredient__name')
+        return get_shopping_cart_response(
+            ingredients, request.accepted_renderer.format
         )
-        return get_csv_shopping_cart(ingredient_recipe)
 
     @action(
         detail=True,
@@ -122,26 +266,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def shopping_cart(self, request, pk):
-        current_user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        serializer = ShoppingCartValidateSerializer(
-            data=request.data,
-            context={'request': request, 'recipe': recipe},
+        return relation_response(
+            request, ShoppingCart, 'recipe', pk, ShoppingCartSerializer, {
+                'POST': 'Этот рецепт уже добавлен в корзину покупок!',
+                'DELETE': 'Этого рецепта нет в корзине покупок пользователя!',
+            }
         )
-        serializer.is_valid(raise_exception=True)
-        if request.method == 'POST':
-            ShoppingCart.objects.create(
-                user=current_user,
-                recipe=recipe
-            )
-            serializer = ShoppingCartSerializer(recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        recipe_in_cart = ShoppingCart.objects.filter(
-            user=current_user,
-            recipe=recipe
-        )
-        recipe_in_cart.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=True,
@@ -149,19 +279,31 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def favorite(self, request, pk):
-        current_user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        serializer = FavoriteValidateSerializer(
-            data=request.data,
-            context={'request': request, 'recipe': recipe},
+        return relation_response(
+            request, Favorite, 'recipe', pk, FavoriteSerializer, {
+                'POST': 'Этот рецепт уже есть в избранном!',
+                'DELETE': 'Этого рецепта нет в избранном пользователя!',
+            }
         )
-        serializer.is_valid(raise_exception=True)
-        if request.method == 'POST':
-            Favorite.objects.create(user=current_user, recipe=recipe)
-            serializer = FavoriteSerializer(recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        recipe_in_favorite = Favorite.objects.filter(
-            user=current_user, recipe=recipe
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart/batch',
+    )
+    def shopping_cart_batch(self, request):
+        return batch_relation_response(
+            request, ShoppingCart, 'recipe', get_batch_ids(request)
+        )
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite/batch',
+    )
+    def favorite_batch(self, request):
+        return batch_relation_response(
+            request, Favorite, 'recipe', get_batch_ids(request)
         )
-        recipe_in_favorite.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,114 @@
+import pickle
+import re
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+# Сколько ключей удаляется одной командой DEL при очистке кэша.
+CLEAR_BATCH_SIZE = 1000
+
+
+class RedisCache(BaseCache):
+    """Кэш Django поверх Redis.
+
+    Клиент задается в OPTIONS['CLIENT_CLASS'] и должен поддерживать
+    интерфейс redis.Redis, в тестах можно подставить fakeredis.FakeRedis.
+    Целые числа хранятся как есть, чтобы incr() выполнялся в Redis.
+    clear() удаляет только ключи этого кэша (с его KEY_PREFIX), а не
+    всю базу Redis.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        self._server = server
+        self._client_class = params.get('OPTIONS', {}).get(
+            'CLIENT_CLASS', 'redis.Redis'
+        )
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = import_string(self._client_class).from_url(
+                self._server
+            )
+        return self._client
+
+    def _ttl(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else max(int(timeout), 0)
+
+    def _dumps(self, value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _loads(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        ttl = self._ttl(timeout)
+        if ttl == 0:
+            return False
+        return bool(self.client.set(
+            self._key(key, version), self._dumps(value), ex=ttl, nx=True,
+        ))
+
+    def get(self, key, default=None, version=None):
+        value = self.client.get(self._key(key, version))
+        return default if value is None else self._loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        ttl = self._ttl(timeout)
+        if ttl == 0:
+            self.client.delete(key)
+            return
+        self.client.set(key, self._dumps(value), ex=ttl)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        ttl = self._ttl(timeout)
+        if ttl is None:
+            return bool(self.client.persist(key))
+        return bool(self.client.expire(key, ttl))
+
+    def delete(self, key, version=None):
+        return bool(self.client.delete(self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+
+        def increment(pipe):
+            # WATCH отменяет транзакцию, если ключ изменился после
+            # проверки, и transaction() повторяет ее заново.
+            if not pipe.exists(key):
+                raise ValueError(f"Key '{key}' not found")
+            pipe.multi()
+            pipe.incrby(key, delta)
+
+        return self.client.transaction(increment, key)[0]
+
+    def clear(self):
+        # Ключи имеют вид <KEY_PREFIX>:<версия>:<ключ>; спецсимволы
+        # шаблона SCAN в префиксе экранируются.
+        prefix = re.sub(r'([*?\[\]\\])', r'\\\1', self.key_prefix)
+        batch = []
+        for key in self.client.scan_iter(
+            match=f'{prefix}:*', count=CLEAR_BATCH_SIZE
+        ):
+            batch.append(key)
+            if len(batch) >= CLEAR_BATCH_SIZE:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
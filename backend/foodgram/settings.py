@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,6 +76,63 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram',
+    }
+}
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'foodgram.cache.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+        # Префикс отделяет ключи проекта от других данных в той же БД
+        # Redis: по нему работает и очистка кэша.
+        'KEY_PREFIX': 'foodgram',
+    }
+
+# Время жизни кэша списка рецептов для анонимных пользователей, секунды
+RECIPE_LIST_CACHE_TIMEOUT = int(os.getenv(
+    key='RECIPE_LIST_CACHE_TIMEOUT', default=60
+))
+
+# Ширины уменьшенных копий фото рецептов и число фоновых потоков,
+# которые их готовят; при 0 копии готовятся сразу после сохранения
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+RECIPE_IMAGE_WORKERS = int(os.getenv(
+    key='RECIPE_IMAGE_WORKERS', default=2
+))
+
+# Ограничения на загружаемое фото рецепта: размер файла в байтах
+# и число пикселей (защита от «бомб» с огромными размерами)
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv(
+    key='RECIPE_IMAGE_MAX_SIZE', default=10 * 1024 * 1024
+))
+RECIPE_IMAGE_MAX_PIXELS = 50_000_000
+
+# Запросы дольше этого времени (мс) пишутся в лог с повторяющимися SQL
+SLOW_REQUEST_MS = int(os.getenv(key='SLOW_REQUEST_MS', default=500))
+
+# Конфигурация полнотекстового поиска PostgreSQL для рецептов
+RECIPE_SEARCH_CONFIG = 'russian'
+
+# Новые рецепты авторов, у которых подписчиков не больше этого числа,
+# сразу раскладываются по лентам; рецепты популярных авторов лента
+# читает напрямую
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv(
+    key='FEED_FANOUT_MAX_FOLLOWERS', default=1000
+))
+
+# Вес добавления в избранное и в корзину в рейтингах рецептов
+RECIPE_SCORE_WEIGHTS = {'favorite': 1.0, 'shopping_cart': 2.0}
+# Период полураспада (часы) и окно (дни) рейтинга trending
+RECIPE_TRENDING_HALF_LIFE = float(os.getenv(
+    key='RECIPE_TRENDING_HALF_LIFE', default=24
+))
+RECIPE_TRENDING_WINDOW = int(os.getenv(
+    key='RECIPE_TRENDING_WINDOW', default=7
+))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME':
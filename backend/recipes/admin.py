@@ -6,7 +6,10 @@ from .models import (
     Ingredient,
     IngredientRecipe,
     Favorite,
-    ShoppingCart
+    ShoppingCart,
+    ShoppingListItem,
+    FeedItem,
+    RecipeScore,
 )
 
 
@@ -24,6 +27,7 @@ class RecipeAdmin(admin.ModelAdmin):
         'name',
         'author',
         'favorites_count',
+        'shopping_cart_count',
     )
     list_filter = (
         'author',
@@ -32,13 +36,10 @@ class RecipeAdmin(admin.ModelAdmin):
     )
     readonly_fields = (
         'favorites_count',
+        'shopping_cart_count',
     )
     inlines = (IngredientInline,)
 
-    @admin.display(description='В избранном')
-    def favorites_count(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
-
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -82,6 +83,7 @@ class FavoriteAdmin(admin.ModelAdmin):
     list_display = (
         'user',
         'recipe',
+        'created',
     )
     search_fields = ('user',)
 
@@ -93,5 +95,40 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = (
         'user',
         'recipe',
+        'created',
     )
     search_fields = ('user',)
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    """Отображение модели ShoppingListItem в админке."""
+
+    list_display = (
+        'user',
+        'ingredient',
+        'total_amount',
+    )
+    search_fields = ('user__username',)
+
+
+@admin.register(FeedItem)
+class FeedItemAdmin(admin.ModelAdmin):
+    """Отображение модели FeedItem в админке."""
+
+    list_display = (
+        'user',
+        'recipe',
+    )
+    search_fields = ('user__username',)
+
+
+@admin.register(RecipeScore)
+class RecipeScoreAdmin(admin.ModelAdmin):
+    """Отображение модели RecipeScore в админке."""
+
+    list_display = (
+        'recipe',
+        'popularity',
+        'trending',
+    )
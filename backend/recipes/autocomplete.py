@@ -0,0 +1,110 @@
+import threading
+
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Ingredient
+
+AUTOCOMPLETE_LIMIT = 30
+
+
+class IngredientTrie:
+    """Префиксное дерево названий ингредиентов без учета регистра.
+
+    Названия вставляются по алфавиту, поэтому обход дочерних узлов
+    в порядке вставки сразу дает отсортированный результат.
+    """
+
+    def __init__(self, ingredients, version=None):
+        self.version = version
+        self.root = {}
+        self.entries = sorted(
+            (name.casefold(), pk) for pk, name in ingredients
+        )
+        for folded, pk in self.entries:
+            node = self.root
+            for char in folded:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(pk)
+
+    def startswith(self, prefix, limit):
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        found = []
+        stack = [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            found.extend(node.get(None, ()))
+            stack.extend(reversed([
+                child for char, child in node.items() if char is not None
+            ]))
+        return found[:limit]
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        """Сначала совпадения по началу названия, затем по вхождению."""
+        query = query.casefold()
+        found = self.startswith(query, limit)
+        if len(found) < limit:
+            contains = sorted(
+                (name.find(query), name, pk) for name, pk in self.entries
+                if name.find(query) > 0
+            )
+            found.extend(pk for _, _, pk in contains[:limit - len(found)])
+        return found
+
+
+_trie = None
+_lock = threading.Lock()
+
+
+def is_fresh(trie, version):
+    return trie is not None and (version is None or trie.version == version)
+
+
+def get_trie(version=None):
+    """Возвращает дерево, при необходимости строя его.
+
+    version - текущая версия данных ингредиентов: дерево, построенное
+    по другой версии (например, в другом процессе), перестраивается.
+    Если дерево прямо сейчас строит другой поток, возвращает None,
+    и поиск выполняется по индексу в БД.
+    """
+    global _trie
+    if is_fresh(_trie, version):
+        return _trie
+    if not _lock.acquire(blocking=False):
+        return None
+    try:
+        if not is_fresh(_trie, version):
+            _trie = IngredientTrie(
+                Ingredient.objects.values_list('id', 'name'), version
+            )
+        return _trie
+    finally:
+        _lock.release()
+
+
+def invalidate_trie():
+    global _trie
+    _trie = None
+
+
+def autocomplete(queryset, query, limit=AUTOCOMPLETE_LIMIT, version=None):
+    """Ингредиенты, подходящие под введенный текст, по релевантности."""
+    trie = get_trie(version)
+    if trie is None:
+        return queryset.filter(name__icontains=query).annotate(
+            rank=Case(
+                When(name__istartswith=query, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('rank', 'name')[:limit]
+    found = trie.search(query, limit)
+    return queryset.filter(pk__in=found).order_by(Case(
+        *[When(pk=pk, then=Value(position))
+          for position, pk in enumerate(found)],
+        output_field=IntegerField(),
+    ))
@@ -0,0 +1,46 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from users.models import Subscription, User
+from .models import Favorite, Recipe, ShoppingCart
+
+
+def change_counter(model, pks, field, delta):
+    """Атомарно меняет счетчик field у объектов model на delta.
+
+    Счетчик не уходит ниже нуля, даже если успел рассинхронизироваться.
+    """
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(count=Count('pk')).values(
+            'count'
+        )
+    ), Value(0))
+
+
+def recount_counter(model, pks, field, related_model, related_field):
+    """Пересчитывает счетчик field у объектов model с id из pks."""
+    return model.objects.filter(pk__in=pks).update(
+        **{field: count_subquery(related_model, related_field)}
+    )
+
+
+def recount():
+    """Пересчитывает все денормализованные счетчики по исходным таблицам."""
+    recipes = Recipe.objects.update(
+        favorites_count=count_subquery(Favorite, 'recipe'),
+        shopping_cart_count=count_subquery(ShoppingCart, 'recipe'),
+    )
+    users = User.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        followers_count=count_subquery(Subscription, 'author'),
+    )
+    return recipes, users
@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.db import connections, router
+
+from users.models import Subscription
+from .models import FeedItem, Recipe
+
+
+def _insert_feed_items(select, params):
+    """Добавляет записи ленты одним запросом INSERT ... SELECT.
+
+    select должен возвращать пары (пользователь, рецепт); уже
+    существующие записи пропускаются.
+    """
+    using = router.db_for_write(FeedItem)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    meta = FeedItem._meta
+    sql = (
+        '{insert} {table} ({user_column}, {recipe_column}) {select} {suffix}'
+    ).format(
+        insert=connection.ops.insert_statement(ignore_conflicts=True),
+        table=quote(meta.db_table),
+        user_column=quote(meta.get_field('user').column),
+        recipe_column=quote(meta.get_field('recipe').column),
+        select=select,
+        suffix=connection.ops.ignore_conflicts_suffix_sql(
+            ignore_conflicts=True
+        ),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def needs_fanout(author):
+    """Раскладывать ли новые рецепты автора по лентам подписчиков."""
+    return author.followers_count <= settings.FEED_FANOUT_MAX_FOLLOWERS
+
+
+def fanout_recipe(recipe):
+    """Добавляет рецепт в ленты всех подписчиков автора."""
+    quote = connections[router.db_for_write(FeedItem)].ops.quote_name
+    meta = Subscription._meta
+    return _insert_feed_items(
+        'SELECT {user}, %s FROM {table} WHERE {author} = %s'.format(
+            user=quote(meta.get_field('user').column),
+            table=quote(meta.db_table),
+            author=quote(meta.get_field('author').column),
+        ),
+        (recipe.pk, recipe.author_id),
+    )
+
+
+def sync_feed(user_id, author_ids):
+    """Приводит ленту пользователя в соответствие с подписками на авторов.
+
+    Записи авторов author_ids удаляются, затем заново добавляются
+    разосланные рецепты тех из них, на кого пользователь подписан.
+    """
+    author_ids = list(author_ids)
+    if not author_ids:
+        return
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author__in=author_ids
+    ).delete()
+    quote = connections[router.db_for_write(FeedItem)].ops.quote_name
+    recipe = Recipe._meta
+    subscription = Subscription._meta
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    _insert_feed_items(
+        'SELECT %s, {pk} FROM {recipes} WHERE {fanout} = %s AND {author} IN '
+        '(SELECT {sub_author} FROM {subscriptions} WHERE {sub_user} = %s '
+        'AND {sub_author} IN ({placeholders}))'.format(
+            pk=quote(recipe.pk.column),
+            recipes=quote(recipe.db_table),
+            fanout=quote(recipe.get_field('feed_fanout').column),
+            author=quote(recipe.get_field('author').column),
+            sub_author=quote(subscription.get_field('author').column),
+            subscriptions=quote(subscription.db_table),
+            sub_user=quote(subscription.get_field('user').column),
+            placeholders=placeholders,
+        ),
+        (user_id, True, user_id, *author_ids),
+    )
+
+
+def rebuild_feed():
+    """Пересобирает ленты всех пользователей по текущим подпискам.
+
+    Рецепты раскладываются, если у автора сейчас не больше
+    FEED_FANOUT_MAX_FOLLOWERS подписчиков. Возвращает число записей.
+    """
+    Recipe.objects.update(feed_fanout=False)
+    Recipe.objects.filter(
+        author__followers_count__lte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).update(feed_fanout=True)
+    FeedItem.objects.all().delete()
+    quote = connections[router.db_for_write(FeedItem)].ops.quote_name
+    recipe = Recipe._meta
+    subscription = Subscription._meta
+    return _insert_feed_items(
+        'SELECT {subscriptions}.{sub_user}, {recipes}.{pk} '
+        'FROM {subscriptions} JOIN {recipes} '
+        'ON {recipes}.{author} = {subscriptions}.{sub_author} '
+        'WHERE {recipes}.{fanout} = %s'.format(
+            sub_user=quote(subscription.get_field('user').column),
+            sub_author=quote(subscription.get_field('author').column),
+            subscriptions=quote(subscription.db_table),
+            pk=quote(recipe.pk.column),
+            recipes=quote(recipe.db_table),
+            author=quote(recipe.get_field('author').column),
+            fanout=quote(recipe.get_field('feed_fanout').column),
+        ),
+        (True,),
+    )
+
+
+def feed_recipe_ids(user, before=None, limit=10):
+    """id рецептов ленты пользователя по убыванию, не больше limit.
+
+    Лента собирается из двух выборок по индексам: записей FeedItem
+    пользователя и рецептов популярных авторов, которые не
+    раскладывались по лентам (частичный индекс recipe_pull_feed_idx).
+    """
+    pushed = FeedItem.objects.filter(user=user)
+    pulled = Recipe.objects.filter(
+        feed_fanout=False,
+        author__in=Subscription.objects.filter(user=user).values('author'),
+    )
+    if before is not None:
+        pushed = pushed.filter(recipe__lt=before)
+        pulled = pulled.filter(pk__lt=before)
+    ids = set(pushed.order_by('-recipe_id').values_list(
+        'recipe', flat=True
+    )[:limit])
+    ids.update(pulled.order_by('-id').values_list('pk', flat=True)[:limit])
+    return sorted(ids, reverse=True)[:limit]
@@ -0,0 +1,130 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/variants/'
+# Формат -> (формат Pillow, расширение, параметры сохранения).
+# exif и прочие метаданные не передаются, поэтому в копии не попадают.
+IMAGE_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {
+        'quality': 85, 'optimize': True, 'progressive': True,
+    }),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Пул фоновых потоков обработки фото."""
+    # Пул создается при первом обращении, уже в процессе-воркере,
+    # чтобы потоки не терялись при fork процессов gunicorn.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+    return _executor
+
+
+def _to_rgb(image):
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def make_variants(image_name, storage=default_storage):
+    """Сохраняет уменьшенные копии изображения во всех форматах.
+
+    Возвращает словарь {формат: {ширина: имя файла в хранилище}}.
+    Копии шире оригинала не создаются.
+    """
+    with storage.open(image_name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    widths = sorted({
+        min(width, image.width) for width in settings.RECIPE_IMAGE_WIDTHS
+    })
+    variants = {}
+    for key, (pil_format, extension, options) in IMAGE_FORMATS.items():
+        converted = image if pil_format == 'WEBP' else _to_rgb(image)
+        if converted.mode not in ('RGB', 'RGBA'):
+            converted = converted.convert('RGBA')
+        variants[key] = {}
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = converted.resize((width, height), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            variants[key][str(width)] = storage.save(
+                f'{VARIANTS_DIR}{stem}_{width}.{extension}',
+                ContentFile(buffer.getvalue()),
+            )
+    return variants
+
+
+def process_recipe_image(recipe_id, image_name):
+    """Готовит копии фото рецепта и записывает их в image_variants.
+
+    Если фото успели заменить, результат отбрасывается: для нового фото
+    уже поставлена своя задача.
+    """
+    try:
+        variants = make_variants(image_name)
+        with transaction.atomic():
+            recipe = Recipe.objects.select_for_update().filter(
+                pk=recipe_id, image=image_name
+            ).first()
+            if recipe is None:
+                return
+            recipe.image_variants = {'source': image_name, **variants}
+            recipe.save(update_fields=['image_variants'])
+    except Exception:
+        logger.exception(
+            'Не удалось подготовить копии фото рецепта %s', recipe_id
+        )
+
+
+def _process_in_worker(recipe_id, image_name):
+    try:
+        process_recipe_image(recipe_id, image_name)
+    finally:
+        # Соединения с БД привязаны к потоку пула.
+        connections.close_all()
+
+
+def schedule_image_variants(recipe):
+    """Ставит подготовку копий фото в очередь после фиксации транзакции."""
+    args = (recipe.pk, recipe.image.name)
+    if settings.RECIPE_IMAGE_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(_process_in_worker, *args)
+        )
+    else:
+        transaction.on_commit(lambda: process_recipe_image(*args))
+
+
+def image_needs_variants(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') != recipe.image.name
+    )
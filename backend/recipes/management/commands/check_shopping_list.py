@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.shopping_list import check_shopping_list
+
+
+class Command(BaseCommand):
+    help = 'Проверяет, что списки покупок совпадают с корзинами.'
+
+    def handle(self, *args, **options):
+        mismatches = check_shopping_list()
+        for user_id, ingredient_id, expected, actual in mismatches:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'ожидается {expected}, сохранено {actual}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {len(mismatches)}. '
+                'Выполните rebuild_shopping_list.'
+            )
+        self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
@@ -0,0 +1,35 @@
+from django.core.management.commands import loaddata
+from django.db import transaction
+
+from recipes.counters import recount
+from recipes.feed import rebuild_feed
+from recipes.scores import refresh_scores
+from recipes.search import rebuild_search_index
+from recipes.shopping_list import rebuild_shopping_list
+
+
+class Command(loaddata.Command):
+    """loaddata с пересчетом производных данных.
+
+    Сигналы при загрузке фикстур пропускают обновление счетчиков,
+    списков покупок, лент, рейтингов и поискового индекса (raw=True):
+    объекты приходят в произвольном порядке, и связанных строк может
+    еще не быть. Поэтому после загрузки все это пересчитывается по
+    исходным таблицам.
+    """
+
+    def handle(self, *fixture_labels, **options):
+        super().handle(*fixture_labels, **options)
+        if not self.loaded_object_count:
+            return
+        with transaction.atomic(using=self.using):
+            recount()
+            rebuild_shopping_list()
+            rebuild_feed()
+            refresh_scores()
+            rebuild_search_index()
+        if self.verbosity >= 1:
+            self.stdout.write(self.style.SUCCESS(
+                'Счетчики, списки покупок, ленты, рейтинги и поисковый '
+                'индекс пересчитаны'
+            ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает полнотекстовый индекс всех рецептов.'
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс пересчитан: рецептов {count}'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.shopping_list import rebuild_shopping_list
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает списки покупок пользователей по их корзинам.'
+
+    def handle(self, *args, **options):
+        created = rebuild_shopping_list()
+        self.stdout.write(self.style.SUCCESS(
+            f'Список покупок пересобран, строк: {created}'
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipes.scores import refresh_scores
+
+
+class Command(BaseCommand):
+    help = 'Обновляет рейтинги рецептов для сортировки по популярности.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every',
+            type=int,
+            metavar='SECONDS',
+            help='Повторять обновление с этим интервалом, не завершаясь.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            created, popularity, trending = refresh_scores()
+            self.stdout.write(self.style.SUCCESS(
+                f'Рейтинги обновлены: добавлено {created}, '
+                f'popularity {popularity}, trending {trending}'
+            ))
+            if not options['every']:
+                break
+            # Между запусками соединение с БД не держим.
+            connections.close_all()
+            time.sleep(options['every'])
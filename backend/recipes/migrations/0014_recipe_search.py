@@ -0,0 +1,98 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:30
+
+import django.contrib.postgres.search
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# На PostgreSQL вектор хранится в recipes_recipe.search_vector,
+# на SQLite вместо него используется таблица FTS5.
+POSTGRESQL_CREATE = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)'
+)
+POSTGRESQL_DROP = 'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin'
+SQLITE_CREATE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts '
+    'USING fts5(name, ingredients, text, '
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+SQLITE_DROP = 'DROP TABLE IF EXISTS recipes_recipe_fts'
+
+
+def fill_postgresql(apps):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    config = settings.RECIPE_SEARCH_CONFIG
+    names = Coalesce(Subquery(
+        IngredientRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    ), Value(''))
+    Recipe.objects.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(names, weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    ))
+
+
+def fill_sqlite(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    names = defaultdict(list)
+    for recipe_id, name in IngredientRecipe.objects.values_list(
+        'recipe', 'ingredient__name'
+    ):
+        names[recipe_id].append(name)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text) '
+            'VALUES (%s, %s, %s, %s)',
+            [
+                (pk, name, ' '.join(names[pk]), text)
+                for pk, name, text in Recipe.objects.values_list(
+                    'pk', 'name', 'text'
+                )
+            ],
+        )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_CREATE)
+        fill_postgresql(apps)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        fill_sqlite(apps, schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_DROP)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
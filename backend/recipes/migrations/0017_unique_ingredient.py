@@ -0,0 +1,56 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    # Ссылки на дубликаты переводятся на ингредиент с меньшим id;
+    # если он уже есть в том же рецепте или списке, количества
+    # складываются.
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    related = (
+        (apps.get_model('recipes', 'IngredientRecipe'), 'recipe_id',
+         'amount'),
+        (apps.get_model('recipes', 'ShoppingListItem'), 'user_id',
+         'total_amount'),
+    )
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('pk'), count=Count('pk')).filter(count__gt=1)
+    for group in duplicates:
+        keep = group['keep']
+        others = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit'],
+        ).exclude(pk=keep).values_list('pk', flat=True))
+        for model, owner, amount in related:
+            for item in model.objects.filter(ingredient__in=others):
+                kept = model.objects.filter(
+                    ingredient_id=keep, **{owner: getattr(item, owner)}
+                ).first()
+                if kept is None:
+                    item.ingredient_id = keep
+                    item.save()
+                else:
+                    setattr(
+                        kept, amount,
+                        getattr(kept, amount) + getattr(item, amount),
+                    )
+                    kept.save()
+                    item.delete()
+        Ingredient.objects.filter(pk__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -1,8 +1,22 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Cast
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from colorfield.fields import ColorField
 
-from users.models import User
+from users.models import User, subscribed_expression
 
 
 class Tag(models.Model):
@@ -49,11 +63,101 @@ class Ingredient(models.Model):
         ordering = ('name', )
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Выборки рецептов, подготовленные для сериализации."""
+
+    def with_related(self, user):
+        """Подгружает связанные объекты и флаги пользователя.
+
+        Число запросов не зависит от количества рецептов на странице;
+        поисковый вектор для вывода не нужен и не загружается.
+        """
+        return self.defer('search_vector').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientrecipe_set',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(
+                    is_subscribed=subscribed_expression(user)
+                ),
+            ),
+        ).with_user_flags(user)
+
+    def matching_ingredients(self, ingredient_ids):
+        """Рецепты, в которых есть хотя бы один из ингредиентов.
+
+        Аннотирует ingredients_count, matched_count, missing_count и
+        coverage - долю ингредиентов рецепта из ingredient_ids - и
+        сортирует по ней. Счетчики считаются подзапросами по индексу
+        (recipe, ingredient), поэтому не зависят от других фильтров.
+        """
+        def count(**lookups):
+            return Subquery(IngredientRecipe.objects.filter(
+                recipe=OuterRef('pk'), **lookups
+            ).order_by().values('recipe').annotate(
+                count=Count('pk')
+            ).values('count'))
+
+        return self.filter(pk__in=IngredientRecipe.objects.filter(
+            ingredient__in=ingredient_ids
+        ).values('recipe')).annotate(
+            ingredients_count=count(),
+            matched_count=count(ingredient__in=ingredient_ids),
+        ).annotate(
+            missing_count=F('ingredients_count') - F('matched_count'),
+            coverage=(
+                Cast('matched_count', FloatField())
+                / Cast('ingredients_count', FloatField())
+            ),
+        ).order_by('-coverage', 'missing_count', '-id')
+
+    def order_by_score(self, score):
+        """Сортирует рецепты по рейтингу popularity или trending.
+
+        Соединение внутреннее, поэтому сортировка идет по индексу
+        рейтинга. Строку RecipeScore каждому рецепту создают сигнал
+        post_save и команды, добавляющие рецепты в обход сигналов
+        (loaddata, load_ndjson, seed_benchmark).
+        """
+        return self.filter(score__isnull=False).order_by(
+            f'-score__{score}', '-score__recipe_id'
+        )
+
+    def with_user_flags(self, user):
+        """Аннотирует рецепты флагами is_favorited и is_in_shopping_cart."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
 
@@ -64,6 +168,7 @@ class Recipe(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Автор рецепта',
         related_name='recipes',
     )
@@ -76,6 +181,16 @@ class Recipe(models.Model):
         verbose_name='фото',
         upload_to='recipes/',
     )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии фото',
+        default=dict,
+        editable=False,
+    )
     name = models.CharField(
         max_length=200,
         verbose_name='Название',
@@ -89,11 +204,40 @@ class Recipe(models.Model):
             1,
             message='Время приготовления не может быть меньше 1 минуты')]
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='В корзинах',
+        default=0,
+        editable=False,
+    )
+    feed_fanout = models.BooleanField(
+        verbose_name='Разослан в ленты подписчиков',
+        default=False,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_author_id_idx',
+            ),
+            # Рецепты популярных авторов, которые лента читает напрямую.
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_pull_feed_idx',
+                condition=models.Q(feed_fanout=False),
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -105,11 +249,13 @@ class IngredientRecipe(models.Model):
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Рецепт',
     )
     ingredient = models.ForeignKey(
         Ingredient,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Ингредиент',
     )
     amount = models.FloatField(
@@ -128,6 +274,16 @@ class IngredientRecipe(models.Model):
                 name='unique_recipeingredient',
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='ingrrecipe_ingredient_idx',
+            ),
+            models.Index(
+                fields=['recipe', 'ingredient', 'amount'],
+                name='ingrrecipe_amount_idx',
+            ),
+        ]
 
 
 class Favorite(models.Model):
@@ -136,15 +292,22 @@ class Favorite(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Пользователь',
         related_name='favorites',
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Рецепт',
         related_name='favorites',
     )
+    created = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Избранное'
@@ -155,6 +318,16 @@ class Favorite(models.Model):
                 name='unique_favorite',
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx',
+            ),
+            models.Index(
+                fields=['created'],
+                name='favorite_created_idx',
+            ),
+        ]
 
 
 class ShoppingCart(models.Model):
@@ -164,14 +337,21 @@ class ShoppingCart(models.Model):
         User,
         verbose_name='Пользователь',
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='shopping_cart',
     )
     recipe = models.ForeignKey(
         Recipe,
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='shopping_cart',
     )
+    created = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Корзина покупок'
@@ -182,3 +362,115 @@ class ShoppingCart(models.Model):
                 name='unique_shopping',
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='shopping_recipe_user_idx',
+            ),
+            models.Index(
+                fields=['created'],
+                name='shopping_created_idx',
+            ),
+        ]
+
+
+class ShoppingListItem(models.Model):
+    """Модель сводного списка покупок пользователя.
+
+    Хранит суммарное количество каждого ингредиента из рецептов
+    в корзине пользователя, поддерживается сигналами.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    total_amount = models.FloatField(
+        verbose_name='Общее количество',
+    )
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Список покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item',
+            ),
+        ]
+
+
+class FeedItem(models.Model):
+    """Рецепт в ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Пользователь',
+        related_name='feed',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_items',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        # Уникальный индекс (user, recipe) обслуживает и чтение ленты:
+        # диапазон по user в обратном порядке recipe.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_item',
+            ),
+        ]
+
+
+class RecipeScore(models.Model):
+    """Рейтинги рецепта для сортировки по популярности.
+
+    Пересчитываются командой refresh_recipe_scores.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='score',
+    )
+    popularity = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+    )
+    trending = models.FloatField(
+        verbose_name='Популярность за последнее время',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(
+                fields=['-popularity', '-recipe'],
+                name='score_popularity_idx',
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'],
+                name='score_trending_idx',
+            ),
+        ]
@@ -0,0 +1,181 @@
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+# Отправляется после массового изменения связей в обход save()/delete():
+# sender - модель связи, user - пользователь, target_ids - id объектов,
+# связи с которыми действительно добавлены или удалены.
+relations_changed = Signal()
+
+
+def add_relation(model, user, field, target_id):
+    """Добавляет связь user -> target_id одним запросом INSERT ... SELECT.
+
+    Конфликт с уникальным ограничением и отсутствующий объект не
+    вызывают ошибок: в обоих случаях ничего не вставляется и
+    возвращается False. Повторный запрос безопасен при гонках.
+    """
+    target = model._meta.get_field(field)
+    target_meta = target.related_model._meta
+    user_field = model._meta.get_field('user')
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    instance = model(user=user, **{target.attname: target_id})
+    # Прочие поля (например, дата добавления) заполняются так же,
+    # как при save().
+    fields = [
+        item for item in model._meta.concrete_fields
+        if item not in (model._meta.pk, user_field, target)
+    ]
+    values = [
+        item.get_db_prep_save(item.pre_save(instance, True), connection)
+        for item in fields
+    ]
+    sql = (
+        '{insert} {table} ({user_column}, {target_column}{columns}) '
+        'SELECT %s, {pk}{placeholders} FROM {target_table} '
+        'WHERE {pk} = %s {suffix}'
+    ).format(
+        insert=connection.ops.insert_statement(ignore_conflicts=True),
+        table=quote(model._meta.db_table),
+        user_column=quote(user_field.column),
+        target_column=quote(target.column),
+        columns=''.join(f', {quote(item.column)}' for item in fields),
+        pk=quote(target_meta.pk.column),
+        placeholders=', %s' * len(fields),
+        target_table=quote(target_meta.db_table),
+        suffix=connection.ops.ignore_conflicts_suffix_sql(
+            ignore_conflicts=True
+        ),
+    )
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (user.pk, *values, target_id))
+            created = cursor.rowcount == 1
+        if created:
+            # Запрос идет в обход save(), поэтому сигналы, которые
+            # поддерживают счетчики и списки покупок, отправляем сами.
+            post_save.send(
+                sender=model,
+                instance=instance,
+                created=True,
+                update_fields=None,
+                raw=False,
+                using=using,
+            )
+    return created
+
+
+def _delete_relations(model, user, target, target_ids, using):
+    """Удаляет связи user -> target_ids запросом DELETE ... WHERE.
+
+    delete() сначала выбирает объекты для сигналов и каскадов; у связей
+    каскадов нет, а сигналы вызывающий код отправляет сам. Возвращает
+    число удаленных строк.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = (
+        'DELETE FROM {table} WHERE {user_column} = %s '
+        'AND {target_column} IN ({placeholders})'
+    ).format(
+        table=quote(model._meta.db_table),
+        user_column=quote(model._meta.get_field('user').column),
+        target_column=quote(target.column),
+        placeholders=', '.join(['%s'] * len(target_ids)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (user.pk, *target_ids))
+        return cursor.rowcount
+
+
+def remove_relation(model, user, field, target_id):
+    """Удаляет связь user -> target_id одним запросом DELETE.
+
+    Возвращает False, если удалять было нечего.
+    """
+    target = model._meta.get_field(field)
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        deleted = _delete_relations(
+            model, user, target, [target_id], using
+        ) == 1
+        if deleted:
+            post_delete.send(
+                sender=model,
+                instance=model(user=user, **{target.attname: target_id}),
+                using=using,
+            )
+    return deleted
+
+
+def _relation_states(model, user, field, target_ids):
+    """Для существующих объектов из target_ids - есть ли уже связь."""
+    target = model._meta.get_field(field)
+    return dict(target.related_model.objects.filter(
+        pk__in=target_ids
+    ).annotate(related=Exists(model.objects.filter(
+        user=user, **{field: OuterRef('pk')}
+    ))).values_list('pk', 'related'))
+
+
+def add_relations(model, user, field, target_ids, exclude=()):
+    """Массово добавляет связи user -> target_ids.
+
+    Возвращает словарь {id: статус}: created, exists или not_found;
+    id из exclude получают статус excluded и не добавляются.
+    """
+    target = model._meta.get_field(field)
+    states = _relation_states(model, user, field, target_ids)
+    results = {}
+    created = []
+    for target_id in target_ids:
+        if target_id in exclude:
+            results[target_id] = 'excluded'
+        elif target_id not in states:
+            results[target_id] = 'not_found'
+        elif states[target_id]:
+            results[target_id] = 'exists'
+        else:
+            results[target_id] = 'created'
+            created.append(target_id)
+    if created:
+        using = router.db_for_write(model)
+        with transaction.atomic(using=using):
+            model.objects.using(using).bulk_create([
+                model(user=user, **{target.attname: target_id})
+                for target_id in created
+            ], ignore_conflicts=True)
+            relations_changed.send(
+                sender=model, user=user, target_ids=created
+            )
+    return results
+
+
+def remove_relations(model, user, field, target_ids):
+    """Массово удаляет связи user -> target_ids одним запросом DELETE.
+
+    Возвращает словарь {id: статус}: deleted, missing или not_found.
+    """
+    target = model._meta.get_field(field)
+    states = _relation_states(model, user, field, target_ids)
+    results = {}
+    deleted = []
+    for target_id in target_ids:
+        if target_id not in states:
+            results[target_id] = 'not_found'
+        elif states[target_id]:
+            results[target_id] = 'deleted'
+            deleted.append(target_id)
+        else:
+            results[target_id] = 'missing'
+    if deleted:
+        using = router.db_for_write(model)
+        with transaction.atomic(using=using):
+            _delete_relations(model, user, target, deleted, using)
+            relations_changed.send(
+                sender=model, user=user, target_ids=deleted
+            )
+    return results
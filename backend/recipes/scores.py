@@ -0,0 +1,104 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    ExpressionWrapper,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+)
+from django.utils import timezone
+
+from .models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+# Порядки сортировки списка рецептов по рейтингу.
+SCORE_ORDERINGS = {'popular': 'popularity', 'trending': 'trending'}
+
+
+def popularity_expression():
+    """Популярность рецепта по его счетчикам избранного и корзин."""
+    weights = settings.RECIPE_SCORE_WEIGHTS
+    return ExpressionWrapper(
+        F('favorites_count') * weights['favorite']
+        + F('shopping_cart_count') * weights['shopping_cart'],
+        output_field=FloatField(),
+    )
+
+
+def create_missing_scores():
+    """Добавляет строки рейтинга рецептам, у которых их нет."""
+    return len(RecipeScore.objects.bulk_create([
+        RecipeScore(recipe_id=pk)
+        for pk in Recipe.objects.filter(
+            score__isnull=True
+        ).values_list('pk', flat=True)
+    ], ignore_conflicts=True))
+
+
+def refresh_popularity():
+    """Пересчитывает popularity; записываются только изменившиеся строки."""
+    value = Subquery(Recipe.objects.filter(pk=OuterRef('pk')).annotate(
+        value=popularity_expression()
+    ).values('value'))
+    return RecipeScore.objects.exclude(popularity=value).update(
+        popularity=value
+    )
+
+
+def trending_scores(now):
+    """Рейтинг trending рецептов с активностью за последнее окно.
+
+    Каждое добавление в избранное или корзину дает свой вес, который
+    уменьшается вдвое за каждые RECIPE_TRENDING_HALF_LIFE часов.
+    Читаются только строки за окно, по индексу created.
+    """
+    weights = settings.RECIPE_SCORE_WEIGHTS
+    half_life = settings.RECIPE_TRENDING_HALF_LIFE * 3600
+    since = now - timedelta(days=settings.RECIPE_TRENDING_WINDOW)
+    scores = defaultdict(float)
+    for model, weight in (
+        (Favorite, weights['favorite']),
+        (ShoppingCart, weights['shopping_cart']),
+    ):
+        for recipe_id, created in model.objects.filter(
+            created__gte=since
+        ).values_list('recipe', 'created').iterator():
+            age = max((now - created).total_seconds(), 0)
+            scores[recipe_id] += weight * 0.5 ** (age / half_life)
+    return scores
+
+
+def refresh_trending(now=None, batch_size=1000):
+    """Пересчитывает trending у рецептов с активностью за окно.
+
+    Рецептам, активность которых вышла за окно, рейтинг обнуляется;
+    остальные строки не затрагиваются.
+    """
+    scores = trending_scores(now or timezone.now())
+    stale = set(RecipeScore.objects.filter(
+        trending__gt=0
+    ).values_list('pk', flat=True)) - set(scores)
+    updates = [
+        RecipeScore(recipe_id=pk, trending=value)
+        for pk, value in scores.items()
+    ] + [RecipeScore(recipe_id=pk, trending=0) for pk in stale]
+    RecipeScore.objects.bulk_update(
+        updates, ['trending'], batch_size=batch_size
+    )
+    return len(updates)
+
+
+def refresh_scores(now=None):
+    """Обновляет рейтинги рецептов.
+
+    Возвращает число добавленных строк и строк с обновленными
+    popularity и trending.
+    """
+    with transaction.atomic():
+        created = create_missing_scores()
+        popularity = refresh_popularity()
+        trending = refresh_trending(now)
+    return created, popularity, trending
@@ -0,0 +1,142 @@
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connections, router, transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from .models import IngredientRecipe, Recipe
+
+# Полнотекстовая таблица FTS5 для SQLite; rowid совпадает с id рецепта.
+FTS_TABLE = 'recipes_recipe_fts'
+# Веса bm25 для столбцов name, ingredients, text - аналог весов A, B, C.
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+MAX_SEARCH_TERMS = 10
+WORD_RE = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """Слова поискового запроса; прочие символы отбрасываются."""
+    return WORD_RE.findall(query.lower())[:MAX_SEARCH_TERMS]
+
+
+def _vendor(using=None):
+    return connections[using or router.db_for_write(Recipe)].vendor
+
+
+def _ingredient_names():
+    return Coalesce(Subquery(
+        IngredientRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    ), Value(''))
+
+
+def _update_postgresql(recipe_ids):
+    config = settings.RECIPE_SEARCH_CONFIG
+    Recipe.objects.filter(pk__in=recipe_ids).update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(_ingredient_names(), weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    ))
+
+
+def _update_sqlite(recipe_ids):
+    names = defaultdict(list)
+    for recipe_id, name in IngredientRecipe.objects.filter(
+        recipe__in=recipe_ids
+    ).values_list('recipe', 'ingredient__name'):
+        names[recipe_id].append(name)
+    rows = [
+        (pk, name, ' '.join(names[pk]), text)
+        for pk, name, text in Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', 'name', 'text')
+    ]
+    connection = connections[router.db_for_write(Recipe)]
+    table = connection.ops.quote_name(FTS_TABLE)
+    with connection.cursor() as cursor:
+        # Удаленные рецепты просто не попадут в rows.
+        cursor.executemany(
+            f'DELETE FROM {table} WHERE rowid = %s',
+            [(pk,) for pk in recipe_ids],
+        )
+        cursor.executemany(
+            f'INSERT INTO {table} (rowid, name, ingredients, text) '
+            f'VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def update_search_index(recipe_ids):
+    """Пересчитывает поисковый индекс рецептов с id из recipe_ids."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    if _vendor() == 'sqlite':
+        _update_sqlite(recipe_ids)
+    else:
+        _update_postgresql(recipe_ids)
+
+
+def schedule_search_update(recipe_ids):
+    """Обновляет индекс после фиксации транзакции.
+
+    К этому моменту ингредиенты рецепта уже записаны, даже если они
+    добавлялись bulk_create без сигналов.
+    """
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: update_search_index(recipe_ids))
+
+
+def rebuild_search_index(batch_size=500):
+    """Пересчитывает поисковый индекс всех рецептов."""
+    recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+    for start in range(0, len(recipe_ids), batch_size):
+        with transaction.atomic():
+            update_search_index(recipe_ids[start:start + batch_size])
+    return len(recipe_ids)
+
+
+def search_recipes(queryset, query):
+    """Рецепты, содержащие все слова запроса (по префиксу), по релевантности.
+
+    Релевантность доступна в аннотации search_rank.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    if _vendor(queryset.db) == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        quote = connections[queryset.db].ops.quote_name
+        table = quote(FTS_TABLE)
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        queryset = queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {table} WHERE {table} MATCH %s', (match,)
+        )).annotate(search_rank=RawSQL(
+            # bm25 тем меньше, чем документ релевантнее.
+            f'SELECT -bm25({table}, {weights}) FROM {table} '
+            f'WHERE {table} MATCH %s AND rowid = '
+            f'{quote(Recipe._meta.db_table)}.{quote(Recipe._meta.pk.column)}',
+            (match,),
+        ))
+    else:
+        search_query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='raw',
+        )
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query),
+        )
+    return queryset.order_by('-search_rank', '-id')
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models import Sum
+
+from users.models import User
+from .models import IngredientRecipe, ShoppingCart, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def cart_totals(users=None, ingredients=None):
+    """Суммы ингредиентов по корзинам, посчитанные по исходным таблицам."""
+    # Условия на корзину задаются одним filter(), чтобы Django
+    # использовал одно соединение с таблицей корзины.
+    lookups = {'recipe__shopping_cart__isnull': False}
+    if users is not None:
+        lookups = {'recipe__shopping_cart__user__in': users}
+    if ingredients is not None:
+        lookups['ingredient__in'] = ingredients
+    return IngredientRecipe.objects.filter(**lookups).values_list(
+        'recipe__shopping_cart__user', 'ingredient'
+    ).annotate(total_amount=Sum('amount')).order_by()
+
+
+def refresh_shopping_list(users, ingredients=None):
+    """Пересчитывает строки списка покупок пользователей.
+
+    users и ingredients - списки id или подзапросы; пересчитываются
+    только строки на их пересечении. Строки пользователей блокируются
+    до конца транзакции: параллельные изменения корзины одного
+    пользователя пересчитывают его список по очереди, а не затирают
+    чужой результат и не нарушают уникальность строк списка.
+    """
+    with transaction.atomic():
+        # Блокировка в порядке id исключает взаимные блокировки
+        # при пересчете списков нескольких пользователей.
+        users = list(User.objects.select_for_update().filter(
+            pk__in=users
+        ).order_by('pk').values_list('pk', flat=True))
+        if not users:
+            return
+        stale = ShoppingListItem.objects.filter(user__in=users)
+        if ingredients is not None:
+            stale = stale.filter(ingredient__in=ingredients)
+        totals = list(cart_totals(users, ingredients))
+        stale.delete()
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total_amount,
+            ) for user_id, ingredient_id, total_amount in totals
+        ])
+
+
+def refresh_recipe_in_carts(recipe_id, ingredients):
+    """Пересчитывает списки покупок всех, у кого рецепт в корзине."""
+    refresh_shopping_list(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values('user'),
+        ingredients,
+    )
+
+
+@transaction.atomic
+def rebuild_shopping_list():
+    """Полностью пересобирает списки покупок всех пользователей."""
+    ShoppingListItem.objects.all().delete()
+    batch = []
+    created = 0
+    for user_id, ingredient_id, total_amount in cart_totals().iterator():
+        batch.append(ShoppingListItem(
+            user_id=user_id,
+            ingredient_id=ingredient_id,
+            total_amount=total_amount,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            created += len(ShoppingListItem.objects.bulk_create(batch))
+            batch = []
+    created += len(ShoppingListItem.objects.bulk_create(batch))
+    return created
+
+
+def check_shopping_list(tolerance=1e-6):
+    """Сравнивает списки покупок с корзинами.
+
+    Возвращает расхождения в виде кортежей
+    (user_id, ingredient_id, ожидаемое количество, сохраненное количество).
+    """
+    stored = {
+        (user_id, ingredient_id): total_amount
+        for user_id, ingredient_id, total_amount
+        in ShoppingListItem.objects.values_list(
+            'user', 'ingredient', 'total_amount'
+        ).iterator()
+    }
+    mismatches = []
+    for user_id, ingredient_id, expected in cart_totals().iterator():
+        actual = stored.pop((user_id, ingredient_id), None)
+        if actual is None or abs(actual - expected) > tolerance:
+            mismatches.append((user_id, ingredient_id, expected, actual))
+    mismatches.extend(
+        (user_id, ingredient_id, None, actual)
+        for (user_id, ingredient_id), actual in stored.items()
+    )
+    return mismatches
@@ -0,0 +1,188 @@
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from users.models import Subscription, User
+from .autocomplete import invalidate_trie
+from .counters import change_counter, recount_counter
+from .feed import fanout_recipe, needs_fanout, sync_feed
+from .images import image_needs_variants, schedule_image_variants
+from .models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    RecipeScore,
+    ShoppingCart,
+)
+from .relations import relations_changed
+from .search import schedule_search_update
+from .shopping_list import refresh_recipe_in_carts, refresh_shopping_list
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, raw, **kwargs):
+    # Счетчики загруженных фикстур пересчитывает loaddata.
+    if created and not raw:
+        change_counter(User, [instance.author_id], 'recipes_count', 1)
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_adding(sender, instance, raw, **kwargs):
+    if instance._state.adding and not raw:
+        instance.feed_fanout = needs_fanout(instance.author)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, raw, **kwargs):
+    if created and not raw and instance.feed_fanout:
+        fanout_recipe(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_score_created(sender, instance, created, raw, **kwargs):
+    # Иначе рецепт не попадет в сортировку по рейтингу до обновления.
+    if created and not raw:
+        RecipeScore.objects.create(recipe=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, raw, **kwargs):
+    if not raw and image_needs_variants(instance):
+        schedule_image_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, [instance.author_id], 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_text_saved(sender, instance, raw, update_fields, **kwargs):
+    if raw or update_fields and not {'name', 'text'} & set(update_fields):
+        return
+    schedule_search_update([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_text_deleted(sender, instance, **kwargs):
+    schedule_search_update([instance.pk])
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(Recipe, [instance.recipe_id], 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_removed(sender, instance, **kwargs):
+    change_counter(Recipe, [instance.recipe_id], 'favorites_count', -1)
+
+
+@receiver(relations_changed, sender=Favorite)
+def favorites_changed(sender, target_ids, **kwargs):
+    # Счетчики пересчитываются по таблице: при массовой вставке
+    # с ignore_conflicts неизвестно, сколько строк добавилось на деле.
+    recount_counter(Recipe, target_ids, 'favorites_count', Favorite, 'recipe')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_added(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(
+            Recipe, [instance.recipe_id], 'shopping_cart_count', 1
+        )
+        refresh_shopping_list(
+            [instance.user_id],
+            IngredientRecipe.objects.filter(
+                recipe_id=instance.recipe_id
+            ).values('ingredient'),
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_removing(sender, instance, **kwargs):
+    # При каскадном удалении рецепта его ингредиенты могут быть
+    # удалены раньше корзины, поэтому запоминаем их заранее.
+    instance.ingredient_ids = list(IngredientRecipe.objects.filter(
+        recipe_id=instance.recipe_id
+    ).values_list('ingredient', flat=True))
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_removed(sender, instance, **kwargs):
+    change_counter(Recipe, [instance.recipe_id], 'shopping_cart_count', -1)
+    ingredients = getattr(instance, 'ingredient_ids', None)
+    if ingredients is None:
+        # Удаление в обход delete() (см. relations.remove_relation):
+        # pre_delete не отправлялся, но ингредиенты рецепта на месте.
+        ingredients = IngredientRecipe.objects.filter(
+            recipe_id=instance.recipe_id
+        ).values('ingredient')
+    refresh_shopping_list([instance.user_id], ingredients)
+
+
+@receiver(relations_changed, sender=ShoppingCart)
+def shopping_cart_changed(sender, user, target_ids, **kwargs):
+    recount_counter(
+        Recipe, target_ids, 'shopping_cart_count', ShoppingCart, 'recipe'
+    )
+    refresh_shopping_list(
+        [user.pk],
+        IngredientRecipe.objects.filter(
+            recipe__in=target_ids
+        ).values('ingredient'),
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_added(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(User, [instance.author_id], 'followers_count', 1)
+        sync_feed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_removed(sender, instance, **kwargs):
+    change_counter(User, [instance.author_id], 'followers_count', -1)
+    sync_feed(instance.user_id, [instance.author_id])
+
+
+@receiver(relations_changed, sender=Subscription)
+def subscriptions_changed(sender, user, target_ids, **kwargs):
+    recount_counter(
+        User, target_ids, 'followers_count', Subscription, 'author'
+    )
+    sync_feed(user.pk, target_ids)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    refresh_recipe_in_carts(instance.recipe_id, [instance.ingredient_id])
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredient_search_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_search_update([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    invalidate_trie()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        schedule_search_update(IngredientRecipe.objects.filter(
+            ingredient=instance
+        ).values_list('recipe', flat=True))
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:40
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+def delete_self_subscriptions(apps, schema_editor):
+    Subscription = apps.get_model('users', 'Subscription')
+    User = apps.get_model('users', 'User')
+    subscriptions = Subscription.objects.filter(
+        user=models.F('author')
+    )
+    authors = list(subscriptions.values_list('author', flat=True))
+    subscriptions.delete()
+    User.objects.filter(pk__in=authors, followers_count__gt=0).update(
+        followers_count=models.F('followers_count') - 1
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_followers_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_self_subscriptions, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.CheckConstraint(check=models.Q(('user', django.db.models.expressions.F('author')), _negated=True), name='prevent_self_subscription'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import BooleanField, Exists, F, OuterRef, Q, Value
 from django.contrib.auth.models import AbstractUser
 
 
@@ -30,6 +31,16 @@ class User(AbstractUser):
         verbose_name='Фамилия',
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -44,10 +55,12 @@ class Subscription(models.Model):
 
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
+                             db_index=False,
                              verbose_name='Подписчик',
                              related_name='follower')
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
+                               db_index=False,
                                verbose_name='Автор рецепта',
                                related_name='following')
 
@@ -59,4 +72,23 @@ class Subscription(models.Model):
                 fields=['user', 'author'],
                 name='unique_subscribtion',
             ),
+            models.CheckConstraint(
+                check=~Q(user=F('author')),
+                name='prevent_self_subscription',
+            ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='subscription_author_user_idx',
+            ),
+        ]
+
+
+def subscribed_expression(user, author_field='pk'):
+    """Выражение-флаг подписки пользователя user на автора."""
+    if user.is_anonymous:
+        return Value(False, output_field=BooleanField())
+    return Exists(Subscription.objects.filter(
+        user=user, author=OuterRef(author_field)
+    ))